@@ -11,15 +11,20 @@
 作者: 数据库系统课程项目小组
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError, OperationFailure
-from datetime import datetime, timedelta
+from pymongo.errors import OperationFailure
+from decimal import Decimal
+from functools import lru_cache
+import hashlib
 import os
-from bson import ObjectId
-import json
+from bson import Decimal128, ObjectId
+import orjson
 
+from config import SETTINGS
+from db import client, db
+from extensions import cache
 from routes import device_routes, log_routes
 
 # ==================== 静态文件路径配置 ====================
@@ -39,71 +44,153 @@ app = Flask(__name__, static_folder=FRONTEND_PATH, static_url_path='')
 # 启用CORS（跨域资源共享），允许前端从不同端口访问API
 CORS(app)
 
-# ==================== MongoDB连接配置 ====================
-# 从环境变量读取MongoDB连接配置，如果没有设置则使用默认值
-# 这样可以在不同环境（开发/生产/Docker）中灵活配置
-MONGO_HOST = os.getenv('MONGO_HOST', 'localhost')  # MongoDB主机地址
-MONGO_PORT = int(os.getenv('MONGO_PORT', 27017))  # MongoDB端口号
-MONGO_USERNAME = os.getenv('MONGO_USERNAME', 'admin')  # 数据库用户名
-MONGO_PASSWORD = os.getenv('MONGO_PASSWORD', 'admin123')  # 数据库密码
-MONGO_DATABASE = os.getenv('MONGO_DATABASE', 'smart_home')  # 数据库名称
-
-# 构建MongoDB连接字符串
-# 如果配置了用户名和密码，使用认证连接
-# authSource=admin 表示使用admin数据库进行身份验证
-if MONGO_USERNAME and MONGO_PASSWORD:
-    MONGO_URI = f"mongodb://{MONGO_USERNAME}:{MONGO_PASSWORD}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DATABASE}?authSource=admin"
-else:
-    # 无认证连接（仅用于开发环境）
-    MONGO_URI = f"mongodb://{MONGO_HOST}:{MONGO_PORT}/{MONGO_DATABASE}"
+# ==================== 响应缓存配置 ====================
+# SimpleCache: 进程内内存缓存，无需额外部署缓存服务（每个Gunicorn worker进程各有一份）
+# 设备统计、附近设备等接口的结果在短时间内变化不大，缓存后可以减少MongoDB查询次数
+# 设备接口的缓存键包含数据库中的设备数据版本，设备写入后所有进程都不会返回旧结果；
+# 日志统计等接口的缓存只按超时时间过期，结果最多滞后各自的缓存时间
+cache.init_app(app, config={'CACHE_TYPE': 'SimpleCache'})
 
 # ==================== 连接MongoDB ====================
-# 创建MongoDB客户端连接
-# serverSelectionTimeoutMS: 服务器选择超时时间（5秒）
-# 如果5秒内无法连接到MongoDB，将抛出异常
+# MongoDB客户端在db.py中创建，应用和各路由模块共享同一个连接池
+# 如果5秒内无法连接到MongoDB（serverSelectionTimeoutMS），将抛出异常
 try:
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    db = client[MONGO_DATABASE]  # 获取数据库对象
     # 测试连接：执行ping命令验证连接是否正常
     client.admin.command('ping')
-    print(f"成功连接到MongoDB: {MONGO_HOST}:{MONGO_PORT}")
+    print(f"成功连接到MongoDB: {SETTINGS.mongo_host}:{SETTINGS.mongo_port}")
 except Exception as e:
     # 连接失败时记录错误，但不中断应用启动
     # 应用仍可启动，但API调用会返回错误
     print(f"MongoDB连接失败: {e}")
     db = None
 
+# ==================== 创建查询索引 ====================
+# 连接成功后确保路由查询依赖的索引存在（索引已存在时不会重复创建）
+# 索引创建失败（如已有重复的device_id）不影响应用启动，仅打印警告
+if db is not None:
+    for ensure_indexes in (device_routes.ensure_indexes, log_routes.ensure_indexes):
+        try:
+            ensure_indexes()
+        except OperationFailure as e:
+            print(f"创建索引失败: {e}")
+
 # ==================== 注册路由蓝图 ====================
 # 将设备管理和日志管理的路由蓝图注册到Flask应用
 # url_prefix: URL前缀，所有该蓝图下的路由都会添加此前缀
 app.register_blueprint(device_routes.bp, url_prefix='/api/devices')
 app.register_blueprint(log_routes.bp, url_prefix='/api/logs')
 
-# ==================== 自定义JSON编码器 ====================
-# MongoDB的ObjectId和Python的datetime对象无法直接序列化为JSON
-# 需要自定义编码器进行转换
-class JSONEncoder(json.JSONEncoder):
+# ==================== 自定义JSON序列化 ====================
+# MongoDB的ObjectId等类型无法直接序列化为JSON
+# Flask 2.3起已移除app.json_encoder，需要通过JSON Provider注册自定义序列化逻辑
+# 序列化使用orjson（Rust实现），datetime等常见类型由orjson原生处理
+
+# 类型分派表：按对象的精确类型查找转换函数
+# orjson只会对它无法原生编码的对象调用default，一次字典查找即可处理
+JSON_TYPE_HANDLERS = {
+    ObjectId: str,  # ObjectId是MongoDB文档的唯一标识符，转换为字符串
+    Decimal128: str  # Decimal128是MongoDB的高精度小数类型，转换为字符串以免丢失精度
+}
+
+def json_default(obj):
+    """
+    orjson的default回调，处理orjson无法原生编码的MongoDB类型
+    
+    Args:
+        obj: 待编码的对象
+    
+    Returns:
+        可被orjson编码的对象
+    
+    Raises:
+        TypeError: 无法处理的类型（orjson要求抛出TypeError）
+    """
+    # 先按精确类型查分派表（常见情况）
+    handler = JSON_TYPE_HANDLERS.get(type(obj))
+    if handler is not None:
+        return handler(obj)
+    # 子类对象再使用isinstance判断
+    for cls, handler in JSON_TYPE_HANDLERS.items():
+        if isinstance(obj, cls):
+            return handler(obj)
+    # Python的Decimal转换为字符串
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+class MongoJSONProvider(JSONProvider):
     """
-    自定义JSON编码器，用于处理MongoDB特殊数据类型
+    基于orjson的JSON序列化提供器，用于处理MongoDB特殊数据类型
     
     功能：
-    1. 将ObjectId转换为字符串
-    2. 将datetime对象转换为ISO格式字符串
-    """
-    def default(self, obj):
-        # ObjectId是MongoDB文档的唯一标识符，需要转换为字符串
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        # datetime对象转换为ISO 8601格式字符串（如：2024-01-01T12:00:00）
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        # 其他类型使用默认编码器处理
-        return super().default(obj)
-
-# 将自定义编码器设置为Flask应用的JSON编码器
-app.json_encoder = JSONEncoder
+    1. 将ObjectId、Decimal128转换为字符串
+    2. 将datetime对象转换为ISO 8601格式字符串（UTC时间，带Z后缀）
+    
+    orjson直接输出紧凑的UTF-8 JSON（中文不转义），
+    datetime由orjson原生编码，无需逐个对象回调Python代码。
+    """
+    # OPT_NAIVE_UTC: MongoDB返回的datetime不带时区，按UTC时间处理
+    # OPT_UTC_Z: UTC时间使用Z后缀（如：2024-01-01T12:00:00Z），避免前端按本地时间解析
+    # OPT_NON_STR_KEYS: 允许字典使用非字符串键
+    options = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj, **kwargs):
+        """序列化为JSON字符串（orjson总是紧凑输出，忽略separators等参数）"""
+        return orjson.dumps(obj, default=json_default, option=self.options).decode()
+    
+    def loads(self, s, **kwargs):
+        """解析JSON字符串或字节串"""
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        """
+        生成JSON响应（jsonify()调用此方法）
+        
+        orjson输出的就是UTF-8字节串，直接作为响应体，
+        省去dumps()解码为字符串、Response再编码回字节串的两次复制。
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=json_default, option=self.options)
+        return self._app.response_class(body, mimetype='application/json')
+
+# 将自定义序列化提供器设置为Flask应用的JSON处理器
+app.json = MongoJSONProvider(app)
 
 # ==================== 前端页面路由 ====================
+@lru_cache(maxsize=None)
+def load_page(filename):
+    """
+    读取前端页面文件，并计算其ETag
+    
+    页面文件在应用运行期间不会变化，首次读取后缓存在内存中，
+    之后的请求不再需要os.stat/open等文件系统调用。
+    修改页面文件后需要重启应用才能生效。
+    
+    Args:
+        filename: 前端目录下的页面文件名（如：index.html）
+    
+    Returns:
+        tuple: (文件内容bytes, ETag字符串)
+    """
+    with open(os.path.join(FRONTEND_PATH, filename), 'rb') as f:
+        content = f.read()
+    return content, hashlib.md5(content).hexdigest()
+
+def page_response(filename):
+    """
+    返回缓存的页面内容，支持If-None-Match条件请求（内容未变化时返回304）
+    
+    Args:
+        filename: 前端目录下的页面文件名
+    
+    Returns:
+        Response: HTML响应
+    """
+    content, etag = load_page(filename)
+    response = Response(content, mimetype='text/html')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
 @app.route('/')
 def index():
     """
@@ -112,7 +199,7 @@ def index():
     Returns:
         HTML文件: 设备管理页面的静态HTML文件
     """
-    return app.send_static_file('index.html')
+    return page_response('index.html')
 
 @app.route('/logs')
 def logs_page():
@@ -122,7 +209,7 @@ def logs_page():
     Returns:
         HTML文件: 日志查询页面的静态HTML文件
     """
-    return app.send_static_file('logs.html')
+    return page_response('logs.html')
 
 # ==================== API健康检查接口 ====================
 @app.route('/api/health')
@@ -153,9 +240,9 @@ def health_check():
         db.command('ping')
         return jsonify({
             'status': 'ok',
-            'database': MONGO_DATABASE,
-            'mongodb_host': MONGO_HOST,
-            'mongodb_port': MONGO_PORT
+            'database': SETTINGS.mongo_database,
+            'mongodb_host': SETTINGS.mongo_host,
+            'mongodb_port': SETTINGS.mongo_port
         })
     except Exception as e:
         # 连接失败时返回错误信息
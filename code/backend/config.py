@@ -0,0 +1,80 @@
+"""
+应用配置模块
+
+本模块在导入时从环境变量读取一次全部配置，生成只读的SETTINGS对象。
+其他模块统一使用 from config import SETTINGS 读取配置，
+避免各模块重复解析环境变量、各自拼接连接字符串而出现不一致。
+
+作者: 数据库系统课程项目小组
+"""
+
+from dataclasses import dataclass
+import os
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    应用配置（只读）
+
+    字段说明：
+    - mongo_host: MongoDB主机地址
+    - mongo_port: MongoDB端口号
+    - mongo_username: 数据库用户名
+    - mongo_password: 数据库密码
+    - mongo_database: 数据库名称
+    - mongo_uri: MongoDB连接字符串（根据以上字段构建一次）
+    - mongo_max_pool_size: 连接池最大连接数
+    - mongo_min_pool_size: 连接池保持的最少空闲连接数
+    """
+    mongo_host: str
+    mongo_port: int
+    mongo_username: str
+    mongo_password: str
+    mongo_database: str
+    mongo_uri: str
+    mongo_max_pool_size: int
+    mongo_min_pool_size: int
+
+    @classmethod
+    def from_env(cls) -> 'Settings':
+        """
+        从环境变量读取配置，如果没有设置则使用默认值
+
+        这样可以在不同环境（开发/生产/Docker）中灵活配置
+
+        Returns:
+            Settings: 配置对象
+        """
+        host = os.getenv('MONGO_HOST', 'localhost')
+        port = int(os.getenv('MONGO_PORT', 27017))
+        username = os.getenv('MONGO_USERNAME', 'admin')
+        password = os.getenv('MONGO_PASSWORD', 'admin123')
+        database = os.getenv('MONGO_DATABASE', 'smart_home')
+        # 连接池大小可按部署规模（worker数量×线程数）调整
+        # 每个Gunicorn worker进程各有一个连接池，同时处理的请求数不超过线程数（默认8），
+        # 空闲连接保持10个即可，避免多个worker各自预建大量用不到的连接
+        max_pool_size = int(os.getenv('MONGO_MAX_POOL_SIZE', 200))
+        min_pool_size = int(os.getenv('MONGO_MIN_POOL_SIZE', 10))
+
+        # 构建MongoDB连接字符串
+        # 如果配置了用户名和密码，使用认证连接
+        # authSource=admin 表示使用admin数据库进行身份验证
+        if username and password:
+            uri = f"mongodb://{username}:{password}@{host}:{port}/{database}?authSource=admin"
+        else:
+            # 无认证连接（仅用于开发环境）
+            uri = f"mongodb://{host}:{port}/{database}"
+
+        return cls(
+            mongo_host=host,
+            mongo_port=port,
+            mongo_username=username,
+            mongo_password=password,
+            mongo_database=database,
+            mongo_uri=uri,
+            mongo_max_pool_size=max_pool_size,
+            mongo_min_pool_size=min_pool_size
+        )
+
+# 全局配置对象，导入时创建一次
+SETTINGS = Settings.from_env()
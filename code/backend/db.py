@@ -0,0 +1,42 @@
+"""
+MongoDB连接模块
+
+本模块负责创建整个应用共享的MongoDB客户端。
+MongoClient自带连接池并且是线程安全的，一个进程只需要一个实例。
+连接配置来自config.SETTINGS。
+app.py和各路由模块都从这里导入client和db，
+避免每个模块各自创建连接池、监控线程并重复进行DNS解析和握手。
+
+作者: 数据库系统课程项目小组
+"""
+
+from pymongo import MongoClient
+
+from config import SETTINGS
+
+# ==================== 创建共享客户端 ====================
+# MongoClient创建时不会阻塞等待连接，真正的连接在第一次操作时建立
+# maxPoolSize/minPoolSize: 连接池大小上下限，预先保持一定数量的空闲连接（可通过环境变量配置）
+# waitQueueTimeoutMS: 连接池耗尽时等待可用连接的最长时间（毫秒）
+# connectTimeoutMS: 建立单个TCP连接的超时时间（毫秒），避免数据库不可达时长时间挂起
+# serverSelectionTimeoutMS: 服务器选择超时时间（5秒），超时后操作抛出异常
+# maxIdleTimeMS: 空闲连接的最长保留时间（毫秒），超时后关闭，避免使用已被网络设备断开的连接
+# compressors: 网络传输压缩，按顺序与服务端协商（zstd需要安装zstandard，zlib为内置）
+# retryWrites/retryReads: 遇到网络抖动或主节点切换时自动重试一次，避免直接向前端返回错误
+# appname: 在MongoDB服务端日志和currentOp中标识本应用的连接，便于排查问题
+# uuidRepresentation: 使用标准UUID二进制格式（与其他语言驱动保持一致）
+client = MongoClient(
+    SETTINGS.mongo_uri,
+    maxPoolSize=SETTINGS.mongo_max_pool_size,
+    minPoolSize=SETTINGS.mongo_min_pool_size,
+    waitQueueTimeoutMS=2500,
+    connectTimeoutMS=2000,
+    serverSelectionTimeoutMS=5000,
+    maxIdleTimeMS=60000,
+    compressors='zstd,zlib',
+    retryWrites=True,
+    retryReads=True,
+    appname='smart_home_api',
+    uuidRepresentation='standard'
+)
+db = client[SETTINGS.mongo_database]  # 获取数据库对象
@@ -0,0 +1,18 @@
+"""
+Flask扩展实例模块
+
+本模块集中创建需要在多个模块之间共享的Flask扩展实例。
+扩展实例在这里创建但不绑定应用，由app.py调用init_app()完成初始化，
+这样路由模块可以直接导入使用，避免与app.py之间的循环导入。
+
+主要扩展：
+1. cache - 响应缓存（Flask-Caching），用于缓存变化不频繁的查询接口
+
+作者: 数据库系统课程项目小组
+"""
+
+from flask_caching import Cache
+
+# 响应缓存实例
+# 具体的缓存类型和默认超时时间在app.py的init_app()中配置
+cache = Cache()
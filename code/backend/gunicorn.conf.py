@@ -0,0 +1,40 @@
+"""
+Gunicorn配置文件（生产环境启动配置）
+
+Flask自带的开发服务器（app.run）单进程运行，一个慢查询会阻塞后续请求。
+生产环境使用Gunicorn启动多个worker进程，每个进程使用多个线程（gthread），
+PyMongo在等待数据库响应时会释放GIL，多个请求的数据库I/O可以相互重叠。
+
+启动方式：
+    gunicorn -c gunicorn.conf.py app:app
+
+作者: 数据库系统课程项目小组
+"""
+
+import multiprocessing
+import os
+
+# ==================== 监听地址 ====================
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# ==================== Worker配置 ====================
+# gthread: 每个worker进程内使用线程池处理请求，适合以数据库I/O为主的接口
+worker_class = 'gthread'
+# worker进程数：默认与CPU核心数相同
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+# 每个worker的线程数：同一进程内最多同时处理的请求数
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+# 注意：不启用preload_app
+# MongoClient不是fork安全的，需要在每个worker进程中各自创建（导入app时创建）
+
+# ==================== 超时配置 ====================
+# 请求处理超过30秒的worker会被重启
+timeout = 30
+# keep-alive连接的保持时间（秒），前端定时轮询时可复用连接
+keepalive = 5
+
+# ==================== 日志配置 ====================
+# 输出到标准输出/标准错误，由Docker收集
+accesslog = '-'
+errorlog = '-'
@@ -33,7 +33,8 @@ class Device:
     @staticmethod
     def create(device_id: str, name: str, device_type: str, 
                location: Dict[str, float], status: str = 'online',
-               config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+               config: Optional[Dict[str, Any]] = None,
+               now: Optional[datetime] = None) -> Dict[str, Any]:
         """
         创建设备文档
         
@@ -53,6 +54,9 @@ class Device:
                 - 智能灯: brightness（亮度）, color（颜色）, power_consumption（功耗）
                 - 温湿度传感器: temperature_range（温度范围）, humidity_range（湿度范围）
                 - 摄像头: resolution（分辨率）, night_vision（夜视功能）
+            now: 当前时间（datetime对象，可选，默认使用当前UTC时间）
+                批量创建设备时可以在循环外获取一次时间并传入，
+                避免每个文档都调用一次datetime.utcnow()
         
         Returns:
             Dict[str, Any]: 设备文档字典，可直接插入MongoDB
@@ -67,6 +71,10 @@ class Device:
             ...     config={'brightness': 80, 'color': 'white'}
             ... )
         """
+        # 只获取一次当前时间，created_at和updated_at共用同一个值
+        # 既减少一次datetime对象分配，也保证新建设备的两个时间戳完全一致
+        if now is None:
+            now = datetime.utcnow()
         device = {
             'device_id': device_id,  # 设备唯一标识
             'name': name,  # 设备名称
@@ -83,8 +91,8 @@ class Device:
             # 使用内嵌文档可以灵活存储不同设备类型的差异化配置
             # 无需为每种设备类型创建单独的表结构
             'config': config or {},  # 如果未提供配置，使用空字典
-            'created_at': datetime.utcnow(),  # 创建时间（UTC时间）
-            'updated_at': datetime.utcnow()  # 更新时间（UTC时间）
+            'created_at': now,  # 创建时间（UTC时间）
+            'updated_at': now  # 更新时间（UTC时间）
         }
         return device
 
@@ -126,7 +134,8 @@ class DeviceLog:
                 - temperature: 温度值
                 - old_status/new_status: 状态变更前后的状态
             timestamp: 时间戳（datetime对象，可选，默认使用当前UTC时间）
-                如果未提供，则使用当前时间
+                如果未提供，则使用当前时间；
+                批量创建日志时可以在循环外获取一次时间并传入，减少datetime对象分配
         
         Returns:
             Dict[str, Any]: 日志文档字典，可直接插入MongoDB
@@ -10,55 +10,439 @@
 5. DELETE /api/devices/<device_id> - 删除设备
 6. GET /api/devices/nearby - 查询附近设备（地理位置查询）
 7. GET /api/devices/stats - 获取设备统计信息（聚合查询）
+8. POST /api/devices/bulk - 批量创建设备
 
 MongoDB特色功能：
 - 使用GeoJSON格式存储地理位置，支持2dsphere索引
-- 使用$near操作符实现附近设备查询
-- 使用聚合管道进行统计分析
+- 使用$geoNear聚合阶段实现附近设备查询
+- 使用聚合管道进行统计分析（结果物化为统计文档并增量维护）
 
 作者: 数据库系统课程项目小组
 """
 
-from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
-from datetime import datetime
-import os
+from flask import Blueprint, Response, request, jsonify
+from pymongo import ReturnDocument, WriteConcern
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import datetime, timedelta
+from functools import lru_cache
+import hashlib
+import re
+import time
 from bson import ObjectId
-from bson.errors import InvalidId
+from bson.regex import Regex
 
 # 添加父目录到Python路径，以便导入models和utils模块
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from db import db
+from extensions import cache
 from models import Device
-from utils import objectid_to_str, validate_location
+from utils import validate_location, build_projection, stream_json_response
 
 # ==================== Flask蓝图初始化 ====================
 # 创建蓝图对象，用于组织路由
 # 蓝图名称：devices，用于URL前缀和路由命名
 bp = Blueprint('devices', __name__)
 
-# ==================== MongoDB连接配置 ====================
-# 从环境变量读取MongoDB连接配置
-MONGO_HOST = os.getenv('MONGO_HOST', 'localhost')
-MONGO_PORT = int(os.getenv('MONGO_PORT', 27017))
-MONGO_USERNAME = os.getenv('MONGO_USERNAME', 'admin')
-MONGO_PASSWORD = os.getenv('MONGO_PASSWORD', 'admin123')
-MONGO_DATABASE = os.getenv('MONGO_DATABASE', 'smart_home')
-
-# 构建MongoDB连接URI
-if MONGO_USERNAME and MONGO_PASSWORD:
-    MONGO_URI = f"mongodb://{MONGO_USERNAME}:{MONGO_PASSWORD}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DATABASE}?authSource=admin"
-else:
-    MONGO_URI = f"mongodb://{MONGO_HOST}:{MONGO_PORT}/{MONGO_DATABASE}"
-
-# 创建MongoDB客户端和数据库连接
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DATABASE]
+# ==================== MongoDB集合 ====================
+# 使用db.py中创建的共享客户端（整个应用共用一个连接池）
 # 获取devices集合对象，用于设备数据的增删改查
 devices_collection = db.devices
+# 设备统计物化文档所在集合：
+# - {_id: 'current', total, by_type, by_status, updated_at, rev}: 设备统计（rev每次修改时更换）
+# - {_id: 'list_version', version}: 设备数据版本，任何设备写入都会更换version
+stats_collection = db.device_stats
+
+# 创建设备的必填字段
+DEVICE_REQUIRED_FIELDS = ('device_id', 'name', 'type', 'location')
+
+# 快速写入：只等待主节点确认写入内存，不等待日志（journal）落盘
+# 客户端通过?fast=1选择，以很短的持久化窗口换取更低的写入延迟
+_fast_devices_collection = devices_collection.with_options(write_concern=WriteConcern(w=1, j=False))
+
+# 批量创建接口单次最多提交的设备数量
+DEVICE_BULK_MAX_SIZE = 1000
+
+# 附近设备查询最多返回的设备数量
+NEARBY_MAX_LIMIT = 100
+
+# 设备统计物化文档的_id
+STATS_DOC_ID = 'current'
+# 设备统计物化文档的最长使用时间，超过后重新聚合生成，修正可能出现的计数偏差
+STATS_MAX_AGE = timedelta(hours=24)
+# 过期统计文档的updated_at，早于任何有效的生成时间
+STATS_EXPIRED_AT = datetime(1970, 1, 1)
+# 设备数据版本文档的_id
+VERSION_DOC_ID = 'list_version'
+# 设备数据版本在进程内缓存的时间（秒）
+# 缓存命中和304响应不必每次都读取版本文档，代价是其他worker最多晚这么久才看到设备写入
+VERSION_CACHE_TTL = 1.0
+
+# 进程内缓存的设备数据版本：{'version': 版本字符串, 'expires': time.monotonic()过期时间}
+_version_cache = {'version': None, 'expires': 0.0}
+
+# 设备列表类接口的默认投影：只返回前端列表视图需要的字段
+# config等内嵌文档可能较大，列表视图并不展示，单个设备详情接口仍返回完整文档
+DEVICE_LIST_PROJECTION = {
+    'device_id': 1,
+    'name': 1,
+    'type': 1,
+    'status': 1,
+    'location': 1,
+    'created_at': 1
+}
+
+# 完整设备ID形态的搜索词（如：DEV0001、dev0001）
+DEVICE_ID_RE = re.compile(r'^DEV\d+$', re.IGNORECASE)
+# 设备ID前缀形态的搜索词（如：DEV、dev00）
+# 设备ID统一为大写，转换后可以使用device_id索引做前缀范围扫描
+DEVICE_ID_PREFIX_RE = re.compile(r'^DEV\d*$', re.IGNORECASE)
+
+def ensure_indexes():
+    """
+    确保devices集合上的查询索引存在
+    
+    在应用启动并确认MongoDB连接成功后调用。索引名称与data/init_db.js保持一致，
+    已存在的相同索引不会重复创建。
+    
+    索引说明：
+    - type_status_idx: 支持设备列表按类型、状态（或仅按类型）筛选
+    - device_id_unique_idx: 设备ID唯一索引，同时支持设备ID前缀搜索
+    - location_status_2dsphere_idx: 地理位置+状态复合索引，附近设备查询（$geoNear）必需，
+      带状态筛选时在索引扫描过程中直接过滤状态
+    - name_idx: 设备名称索引，名称模糊搜索时在索引键上匹配，避免集合扫描
+    
+    这里只创建索引，不删除索引：旧版本的单字段地理索引location_2dsphere_idx
+    由data/migrate_location_index.js一次性删除，避免每个worker启动时都执行并相互竞争。
+    """
+    devices_collection.create_index([('type', 1), ('status', 1)], name='type_status_idx')
+    devices_collection.create_index([('device_id', 1)], unique=True, name='device_id_unique_idx')
+    devices_collection.create_index([('location', '2dsphere'), ('status', 1)],
+                                    name='location_status_2dsphere_idx')
+    devices_collection.create_index([('name', 1)], name='name_idx')
+
+@bp.after_request
+def add_etag(response):
+    """
+    为设备接口的GET响应添加ETag，并处理If-None-Match条件请求
+    
+    前端会定时刷新设备统计等数据，大部分时候内容没有变化。
+    客户端带上次的ETag请求时，内容未变化则直接返回304（不含响应体），
+    省去网络传输和前端重新解析。
+    流式响应（设备列表）由视图函数自行计算ETag，这里跳过。
+    """
+    if (request.method == 'GET' and response.status_code == 200
+            and not response.is_streamed and not response.get_etag()[0]):
+        response.set_etag(hashlib.blake2b(response.get_data(), digest_size=8).hexdigest())
+        response.make_conditional(request)
+    return response
+
+def _remember_version(version):
+    """将设备数据版本缓存在进程内，VERSION_CACHE_TTL秒后重新从数据库读取"""
+    _version_cache['version'] = version
+    _version_cache['expires'] = time.monotonic() + VERSION_CACHE_TTL
+    return version
+
+def _device_data_version():
+    """
+    读取设备数据版本
+    
+    版本先在进程内缓存VERSION_CACHE_TTL秒，过期后才按_id读取版本文档，
+    因此响应缓存命中和304响应基本不需要数据库往返。
+    版本文档不存在时（首次使用，或导入脚本直接写库后删除了它）生成一个新版本，
+    保证与之前发出的ETag不同。
+    
+    Returns:
+        str: 版本字符串
+    """
+    if time.monotonic() < _version_cache['expires']:
+        return _version_cache['version']
+    
+    doc = stats_collection.find_one({'_id': VERSION_DOC_ID})
+    if doc is None:
+        doc = stats_collection.find_one_and_update(
+            {'_id': VERSION_DOC_ID},
+            {'$setOnInsert': {'version': ObjectId()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    return _remember_version(str(doc['version']))
+
+def _bump_device_data_version():
+    """
+    设备被创建、更新或删除后更换设备数据版本（所有worker进程共享同一个版本文档）
+    
+    执行写入的进程立即使用新版本，其他进程在进程内缓存的版本过期后（VERSION_CACHE_TTL秒内）读到新版本。
+    """
+    version = ObjectId()
+    stats_collection.update_one({'_id': VERSION_DOC_ID},
+                                {'$set': {'version': version}}, upsert=True)
+    _remember_version(str(version))
+
+def _device_list_etag():
+    """
+    计算设备列表响应的ETag
+    
+    响应内容只由设备数据和查询参数（筛选条件、搜索关键词、投影字段）决定，
+    因此用设备数据版本和查询参数计算ETag，不需要扫描匹配的设备文档。
+    
+    Returns:
+        str: ETag字符串
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(_device_data_version().encode())
+    digest.update(repr(sorted(request.args.items(multi=True))).encode())
+    return digest.hexdigest()
+
+def _invalidate_cache():
+    """
+    使设备相关接口的ETag和响应缓存失效
+    
+    设备被创建、更新或删除后调用。更换设备数据版本后，
+    列表ETag和缓存键（见_device_cache_key）都随之改变，所有worker进程都不会再命中旧结果；
+    旧的缓存项不再被读取，到期后自动清除。日志接口的缓存不受影响。
+    
+    版本在写入完成后才更换，并且其他进程最多晚VERSION_CACHE_TTL秒读到新版本，
+    这段时间内其他进程可能仍返回写入前的结果（旧版本对应的缓存或ETag）。
+    新版本只在写入完成后出现，因此新版本的缓存键下不会缓存写入前的数据；
+    旧版本的缓存键下即使缓存了写入后的数据也不会造成错误，版本过期后不再被读取。
+    这个最多约1秒的滞后窗口是有意接受的。
+    """
+    _bump_device_data_version()
+
+def _device_cache_key(*args, **kwargs):
+    """
+    设备接口的响应缓存键：设备数据版本 + 请求路径 + 查询参数
+    
+    响应缓存是每个worker进程各自的内存缓存，写入请求只由其中一个进程处理，
+    无法逐个清除其他进程的缓存；缓存键包含共享的设备数据版本，
+    任一进程写入设备后，所有进程的缓存键都会改变。
+    """
+    query = repr(sorted(request.args.items(multi=True)))
+    return f'devices:{_device_data_version()}:{request.path}:{query}'
+
+# ==================== 设备统计物化文档 ====================
+# 设备的类型和状态分布变化远少于统计接口的读取次数，
+# 因此在创建/更新/删除设备时用$inc增量维护一个统计文档，统计接口只需一次find_one。
+# 统计文档不存在或超过STATS_MAX_AGE时，重新执行聚合生成。
+# 统计文档的rev字段在每次修改时更换：重新生成的统计文档只在rev未变化时写入，
+# 聚合期间发生的设备写入不会被覆盖。
+
+def _is_stats_key(value):
+    """
+    判断类型/状态值能否作为统计文档的字段名
+    
+    含'.'或以'$'开头的值无法用作$inc的字段路径，这类值出现时改为删除统计文档，
+    由下次查询重新聚合生成。
+    """
+    return isinstance(value, str) and value != '' and '.' not in value and not value.startswith('$')
+
+def _expire_stats():
+    """
+    使统计文档过期，由下次查询重新聚合生成
+    
+    不直接删除统计文档，而是更换rev并将updated_at设为最早时间：
+    正在进行的重新生成（见_rebuild_stats）发现rev变化后放弃写入，
+    不会用聚合开始前的结果覆盖这次设备写入。
+    """
+    stats_collection.update_one(
+        {'_id': STATS_DOC_ID},
+        {'$set': {'rev': ObjectId(), 'updated_at': STATS_EXPIRED_AT}},
+        upsert=True
+    )
+
+def _adjust_stats(old=None, new=None):
+    """
+    按设备的变化增量更新统计文档
+    
+    Args:
+        old: 变化前的设备文档（至少包含type和status，新建设备时为None）
+        new: 变化后的设备文档（至少包含type和status，删除设备时为None）
+    
+    示例:
+        >>> _adjust_stats(new=device)  # 新建设备
+        >>> _adjust_stats(old=device)  # 删除设备
+        >>> _adjust_stats(old=before, new=after)  # 修改类型或状态
+    """
+    inc = {}
+    for doc, delta in ((old, -1), (new, 1)):
+        if doc is None:
+            continue
+        inc['total'] = inc.get('total', 0) + delta
+        for field, key in (('type', 'by_type'), ('status', 'by_status')):
+            value = doc.get(field)
+            if not _is_stats_key(value):
+                # 无法增量维护，使统计文档过期，下次查询时重新生成
+                _expire_stats()
+                return
+            path = f'{key}.{value}'
+            inc[path] = inc.get(path, 0) + delta
+    
+    # 去掉相互抵消的项（如只修改了名称）
+    inc = {path: delta for path, delta in inc.items() if delta}
+    if inc:
+        # 不使用upsert，避免生成只含部分计数的文档
+        result = stats_collection.update_one({'_id': STATS_DOC_ID},
+                                             {'$inc': inc, '$set': {'rev': ObjectId()}})
+        if result.matched_count == 0:
+            # 统计文档不存在（可能正在重新生成），写入过期标记，
+            # 使聚合开始前的结果不会被保存，下次查询时重新生成
+            _expire_stats()
+
+def _rebuild_stats():
+    """
+    使用聚合管道重新生成设备统计文档
+    
+    聚合前读取统计文档的rev，写入时以rev为条件：聚合期间有设备写入更换了rev
+    （或插入了过期标记）时放弃写入，只返回本次结果，下次查询再重新生成。
+    
+    Returns:
+        Dict: 统计文档 {'total': 总数, 'by_type': {类型: 数量}, 'by_status': {状态: 数量}}
+    """
+    current = stats_collection.find_one({'_id': STATS_DOC_ID}, {'rev': 1})
+    
+    # $facet在同一批输入文档上执行多个子管道，只需一次网络往返、一次集合扫描
+    result = next(devices_collection.aggregate([
+        {
+            '$facet': {
+                # 按设备类型统计：按type字段分组，统计每种类型的设备数量
+                'by_type': [
+                    {'$group': {'_id': '$type', 'count': {'$sum': 1}}}  # $sum: 1表示计数
+                ],
+                # 按设备状态统计：按status字段分组，统计每种状态的设备数量
+                'by_status': [
+                    {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+                ]
+            }
+        }
+    ]))
+    
+    by_type = {item['_id']: item['count'] for item in result['by_type']}
+    by_status = {item['_id']: item['count'] for item in result['by_status']}
+    stats = {
+        '_id': STATS_DOC_ID,
+        # 每个设备恰好属于一个类型分组，分组计数之和即为总设备数
+        'total': sum(by_type.values()),
+        'by_type': by_type,
+        'by_status': by_status,
+        'updated_at': datetime.utcnow(),
+        'rev': ObjectId()
+    }
+    
+    # 所有类型/状态都能作为字段名时才保存，否则只返回本次结果
+    if all(_is_stats_key(key) for key in list(by_type) + list(by_status)):
+        if current is None:
+            try:
+                stats_collection.insert_one(stats)
+            except DuplicateKeyError:
+                # 聚合期间统计文档已被其他请求创建或标记为过期，放弃写入
+                pass
+        else:
+            # rev已变化时不匹配任何文档，放弃写入
+            stats_collection.replace_one({'_id': STATS_DOC_ID, 'rev': current.get('rev')}, stats)
+    return stats
+
+def _stats_to_list(counts):
+    """
+    将统计文档中的{值: 数量}映射转换为前端使用的[{'_id': 值, 'count': 数量}]列表
+    
+    数量为0的项（对应设备已全部删除或修改）不返回，结果按数量降序排列。
+    """
+    items = [{'_id': key, 'count': count} for key, count in counts.items() if count > 0]
+    items.sort(key=lambda item: item['count'], reverse=True)
+    return items
+
+def _build_device(data, now=None):
+    """
+    验证创建设备的请求数据并创建设备文档
+    
+    单个创建和批量创建接口共用的校验逻辑。
+    
+    Args:
+        data: 单个设备的请求数据
+        now: 当前时间（可选，批量创建时整批共用）
+    
+    Returns:
+        Tuple: (设备文档, None)，校验失败时为(None, 错误信息)
+    """
+    if not isinstance(data, dict):
+        return None, '设备数据格式错误'
+    
+    # 验证必填字段
+    # 检查所有必填字段是否都存在
+    for field in DEVICE_REQUIRED_FIELDS:
+        if field not in data:
+            return None, f'缺少必填字段: {field}'
+    
+    # 验证地理位置数据格式和有效性
+    # 检查经纬度范围是否正确
+    if not validate_location(data['location']):
+        return None, '地理位置数据格式错误'
+    
+    # 使用Device模型类创建设备文档
+    # 这会自动设置created_at和updated_at时间戳
+    # 并将location转换为GeoJSON格式
+    device = Device.create(
+        device_id=data['device_id'],
+        name=data['name'],
+        device_type=data['type'],
+        location=data['location'],
+        status=data.get('status', 'online'),  # 默认状态为online
+        config=data.get('config', {}),  # 默认配置为空字典
+        now=now
+    )
+    return device, None
+
+def _build_search_filter(search):
+    """
+    根据搜索关键词构建查询条件
+    
+    - 完整设备ID（如DEV0001）：先在唯一索引上精确查找，存在时直接按等值条件查询
+    - 设备ID形态的关键词：使用区分大小写的锚定正则（^DEV00），
+      MongoDB可以在device_id索引上做前缀范围扫描，而不必全表扫描
+    - 其他关键词：在设备ID和名称中模糊搜索（不区分大小写）
+      关键词会先转义，避免用户输入被当作正则表达式解析
+    
+    Args:
+        search: 已去除首尾空白的搜索关键词
+    
+    Returns:
+        Dict: MongoDB查询条件
+    """
+    if DEVICE_ID_PREFIX_RE.match(search):
+        device_id = search.upper()
+        # 用户输入了完整设备ID时，等值查询比正则前缀扫描更直接
+        # find_one只返回_id，唯一索引上一次查找即可确定是否存在
+        if DEVICE_ID_RE.match(search) and devices_collection.find_one({'device_id': device_id}, {'_id': 1}):
+            return {'device_id': device_id}
+        return {'device_id': {'$regex': '^' + re.escape(device_id)}}
+    # 非锚定正则无法做前缀范围扫描，但device_id和name上都有索引时，
+    # $or的两个分支都会在索引键上匹配正则（IXSCAN），只回表读取匹配的文档，
+    # 不必逐个读取完整文档做集合扫描
+    # 未使用$text：文本索引按空白和标点分词，无法匹配中文名称中的子串（如"客厅智能灯"中的"智能灯"）
+    pattern = _search_regex(search)
+    return {'$or': [
+        {'device_id': pattern},
+        {'name': pattern}
+    ]}
+
+@lru_cache(maxsize=256)
+def _search_regex(search):
+    """
+    构建（并缓存）关键词的不区分大小写正则对象
+    
+    前端轮询时同一个关键词会反复出现，缓存后无需每次转义；
+    两个$or分支共用同一个BSON Regex对象，编码结果与{'$regex': ..., '$options': 'i'}相同。
+    
+    Args:
+        search: 搜索关键词
+    
+    Returns:
+        Regex: BSON正则对象
+    """
+    return Regex(re.escape(search), 'i')
 
 @bp.route('', methods=['GET'])
 def get_devices():
@@ -68,12 +452,15 @@ def get_devices():
     支持以下查询参数：
     - type: 设备类型筛选（精确匹配）
     - status: 设备状态筛选（精确匹配）
-    - search: 搜索关键词（在设备ID和名称中模糊搜索，不区分大小写）
+    - search: 搜索关键词（在设备ID和名称中模糊搜索，不区分大小写；
+              设备ID形态的关键词如DEV00按设备ID前缀匹配）
+    - fields: 返回字段（可选，逗号分隔，默认只返回列表视图所需字段）
     
     URL示例：
     - GET /api/devices
     - GET /api/devices?type=智能灯&status=online
     - GET /api/devices?search=客厅
+    - GET /api/devices?fields=device_id,name,config
     
     Returns:
         JSON响应:
@@ -89,10 +476,13 @@ def get_devices():
             }
     """
     try:
+        # 查询参数只转换一次为普通字典，后续直接按字典读取
+        args = request.args.to_dict()
+        
         # 从请求参数中获取筛选条件
-        device_type = request.args.get('type')  # 设备类型筛选
-        status = request.args.get('status')  # 设备状态筛选
-        search = request.args.get('search', '').strip()  # 搜索关键词
+        device_type = args.get('type')  # 设备类型筛选
+        status = args.get('status')  # 设备状态筛选
+        search = args.get('search', '').strip()  # 搜索关键词
         
         # 构建MongoDB查询条件
         query = {}
@@ -103,29 +493,31 @@ def get_devices():
         if status:
             query['status'] = status
         
-        # 搜索功能：按设备ID或名称模糊搜索
-        # 使用$or操作符实现多字段搜索
-        # $regex: 正则表达式匹配
-        # $options: 'i' 表示不区分大小写
+        # 搜索功能：按设备ID或名称搜索
+        # 设备ID形态的关键词走索引前缀扫描，其他关键词在ID和名称中模糊匹配
         if search:
-            query['$or'] = [
-                {'device_id': {'$regex': search, '$options': 'i'}},
-                {'name': {'$regex': search, '$options': 'i'}}
-            ]
+            query.update(_build_search_filter(search))
         
-        # 执行MongoDB查询
-        # find()返回游标对象，使用list()转换为列表
-        devices = list(devices_collection.find(query))
+        # 投影：只取需要的字段，减少传输和解码的数据量
+        projection = build_projection(args.get('fields'), DEVICE_LIST_PROJECTION)
         
-        # 转换ObjectId为字符串，以便JSON序列化
-        devices = objectid_to_str(devices)
+        # 条件请求：结果集未变化时直接返回304，跳过文档查询、编码和传输
+        etag = _device_list_etag()
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
         
-        # 返回成功响应
-        return jsonify({
-            'success': True,
-            'count': len(devices),  # 设备数量
-            'data': devices  # 设备列表
-        })
+        # 执行MongoDB查询
+        # find()返回游标对象，不再使用list()一次性转换为列表
+        # batch_size(500): 每批从服务端取500个文档，边解码边发送给客户端
+        cursor = devices_collection.find(query, projection).batch_size(500)
+        
+        # 流式返回：文档逐个编码输出，内存占用与设备数量无关
+        # （流式响应无法被响应缓存保存，因此该接口不使用缓存）
+        response = stream_json_response(cursor)
+        response.set_etag(etag)
+        return response
     except Exception as e:
         # 捕获所有异常，返回错误响应
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -161,9 +553,6 @@ def get_device(device_id):
         if not device:
             return jsonify({'success': False, 'error': '设备不存在'}), 404
         
-        # 转换ObjectId为字符串
-        device = objectid_to_str(device)
-        
         # 返回成功响应
         return jsonify({'success': True, 'data': device})
     except Exception as e:
@@ -188,6 +577,10 @@ def create_device():
         "config": {}             // 可选：设备配置（内嵌文档）
     }
     
+    查询参数：
+    - fast: 为1时不等待写入日志落盘（w=1, j=False），写入延迟更低，
+            但服务器在落盘前崩溃时可能丢失这次写入
+    
     Returns:
         JSON响应:
             {
@@ -202,36 +595,18 @@ def create_device():
             }
     """
     try:
-        # 获取请求体中的JSON数据
-        data = request.get_json()
-        
-        # 验证必填字段
-        # 检查所有必填字段是否都存在
-        required_fields = ['device_id', 'name', 'type', 'location']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'success': False, 'error': f'缺少必填字段: {field}'}), 400
-        
-        # 验证地理位置数据格式和有效性
-        # 检查经纬度范围是否正确
-        if not validate_location(data['location']):
-            return jsonify({'success': False, 'error': '地理位置数据格式错误'}), 400
-        
-        # 使用Device模型类创建设备文档
-        # 这会自动设置created_at和updated_at时间戳
-        # 并将location转换为GeoJSON格式
-        device = Device.create(
-            device_id=data['device_id'],
-            name=data['name'],
-            device_type=data['type'],
-            location=data['location'],
-            status=data.get('status', 'online'),  # 默认状态为online
-            config=data.get('config', {})  # 默认配置为空字典
-        )
+        # 获取请求体中的JSON数据，验证并创建设备文档
+        device, error = _build_device(request.get_json())
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
         # 插入数据库
         # insert_one()返回InsertOneResult对象，包含inserted_id
-        result = devices_collection.insert_one(device)
+        # ?fast=1时不等待日志落盘（w=1, j=False）
+        collection = _fast_devices_collection if request.args.get('fast') == '1' else devices_collection
+        result = collection.insert_one(device)
+        _adjust_stats(new=device)
+        _invalidate_cache()
         
         # 返回成功响应，状态码201（Created）
         return jsonify({
@@ -248,6 +623,75 @@ def create_device():
         # 捕获其他所有异常
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@bp.route('/bulk', methods=['POST'])
+def create_devices_bulk():
+    """
+    批量创建设备接口
+    
+    批量导入设备时一次请求提交多个设备，用一次insert_many写入，
+    避免每个设备各自付出一次HTTP请求、数据库往返和日志落盘等待。
+    
+    请求体（JSON数组，最多DEVICE_BULK_MAX_SIZE个，每个元素格式与创建设备接口相同）：
+    [
+        {"device_id": "DEV0001", "name": "客厅智能灯", "type": "智能灯",
+         "location": {"longitude": 113.2644, "latitude": 23.1291}},
+        ...
+    ]
+    
+    Returns:
+        JSON响应:
+            {
+                'success': True,  // 全部写入成功时为True
+                'inserted': 写入成功的数量,
+                'failed': [{'index': 数组下标, 'error': '错误信息'}, ...]
+            }
+            任意一个设备校验失败时不写入任何设备，返回400和每个设备的校验错误
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, list) or not data:
+            return jsonify({'success': False, 'error': '请求体必须是非空的设备数组'}), 400
+        if len(data) > DEVICE_BULK_MAX_SIZE:
+            return jsonify({'success': False, 'error': f'单次最多提交{DEVICE_BULK_MAX_SIZE}个设备'}), 400
+        
+        # 先校验全部设备，有错误时整批拒绝
+        # 整批设备共用一次获取的当前时间
+        now = datetime.utcnow()
+        devices = []
+        failed = []
+        for index, item in enumerate(data):
+            device, error = _build_device(item, now)
+            if error:
+                failed.append({'index': index, 'error': error})
+            else:
+                devices.append(device)
+        if failed:
+            return jsonify({'success': False, 'error': '设备校验失败', 'failed': failed}), 400
+        
+        # ordered=False: 某个设备写入失败（如设备ID重复）时继续写入其余设备
+        try:
+            result = devices_collection.insert_many(devices, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted = e.details.get('nInserted', 0)
+            failed = [{'index': err['index'],
+                       'error': '设备ID已存在' if err.get('code') == 11000 else err['errmsg']}
+                      for err in e.details.get('writeErrors', [])]
+        
+        if inserted:
+            # 批量写入后使统计文档过期，由下次查询重新聚合生成（比逐个$inc更省往返）
+            _expire_stats()
+            _invalidate_cache()
+        
+        return jsonify({
+            'success': not failed,
+            'inserted': inserted,
+            'failed': failed
+        }), 201 if inserted else 400
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @bp.route('/<device_id>', methods=['PUT'])
 def update_device(device_id):
     """更新设备信息"""
@@ -255,7 +699,8 @@ def update_device(device_id):
         data = request.get_json()
         
         # 构建更新文档
-        update_doc = {'updated_at': datetime.utcnow()}
+        # updated_at由下面的$currentDate使用数据库服务器时间设置
+        update_doc = {}
         
         if 'name' in data:
             update_doc['name'] = data['name']
@@ -274,13 +719,27 @@ def update_device(device_id):
             update_doc['config'] = data['config']
         
         # 更新设备
-        result = devices_collection.update_one(
+        # $currentDate: 使用数据库服务器的当前时间设置updated_at，
+        # 与修改在同一次原子更新中完成，不受各应用服务器时钟偏差影响
+        update = {'$currentDate': {'updated_at': True}}
+        if update_doc:
+            update['$set'] = update_doc
+        
+        # find_one_and_update返回更新前的类型和状态，用于增量维护统计文档
+        before = devices_collection.find_one_and_update(
             {'device_id': device_id},
-            {'$set': update_doc}
+            update,
+            projection={'_id': 0, 'type': 1, 'status': 1},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if before is None:
             return jsonify({'success': False, 'error': '设备不存在'}), 404
+        if 'type' in update_doc or 'status' in update_doc:
+            _adjust_stats(old=before, new=dict(before, **{
+                field: update_doc[field] for field in ('type', 'status') if field in update_doc
+            }))
+        _invalidate_cache()
         
         return jsonify({'success': True, 'message': '设备更新成功'})
         
@@ -291,10 +750,16 @@ def update_device(device_id):
 def delete_device(device_id):
     """删除设备"""
     try:
-        result = devices_collection.delete_one({'device_id': device_id})
+        # find_one_and_delete返回被删除设备的类型和状态，用于增量维护统计文档
+        deleted = devices_collection.find_one_and_delete(
+            {'device_id': device_id},
+            projection={'_id': 0, 'type': 1, 'status': 1}
+        )
         
-        if result.deleted_count == 0:
+        if deleted is None:
             return jsonify({'success': False, 'error': '设备不存在'}), 404
+        _adjust_stats(old=deleted)
+        _invalidate_cache()
         
         return jsonify({'success': True, 'message': '设备删除成功'})
         
@@ -302,43 +767,50 @@ def delete_device(device_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @bp.route('/nearby', methods=['GET'])
+@cache.cached(timeout=5, make_cache_key=_device_cache_key)  # 按查询参数分别缓存5秒
 def get_nearby_devices():
     """
     查询附近设备接口（MongoDB地理位置查询）
     
-    这是MongoDB文档数据库的特色功能，使用2dsphere索引和$near操作符实现。
-    需要确保devices集合的location字段上已创建2dsphere索引。
+    这是MongoDB文档数据库的特色功能，使用2dsphere索引和$geoNear聚合阶段实现。
+    需要确保devices集合的location字段上已创建2dsphere索引（由ensure_indexes创建location+status复合索引）。
     
     查询参数：
     - longitude: 经度（必填，范围：-180到180）
     - latitude: 纬度（必填，范围：-90到90）
     - max_distance: 最大距离（可选，单位：米，默认：1000）
-    - limit: 返回结果数量限制（可选，默认：10）
+    - limit: 返回结果数量限制（可选，默认：10，限制在1到NEARBY_MAX_LIMIT之间）
     - status: 设备状态筛选（可选）
+    - fields: 返回字段（可选，逗号分隔，默认只返回列表视图所需字段）
     
     URL示例：
     - GET /api/devices/nearby?longitude=113.2644&latitude=23.1291&max_distance=500
     
     MongoDB查询原理：
-    - 使用$near操作符进行地理位置查询
-    - $geometry: 指定查询中心点（GeoJSON Point格式）
-    - $maxDistance: 指定最大搜索距离（米）
-    - 结果按距离从近到远排序
+    - 使用$geoNear聚合阶段进行地理位置查询
+    - near: 指定查询中心点（GeoJSON Point格式）
+    - maxDistance: 指定最大搜索距离（米）
+    - query: 状态筛选在地理位置扫描时一并完成
+    - 结果按距离从近到远排序，每个设备附带distance字段（米）
     
     Returns:
         JSON响应:
             {
                 'success': True,
                 'count': 设备数量,
-                'data': [设备列表，按距离排序]
+                'data': [设备列表，按距离排序，含distance字段]
             }
     """
     try:
+        args = request.args.to_dict()
+        
         # 获取查询参数并转换为数值类型
-        longitude = float(request.args.get('longitude', 0))  # 经度
-        latitude = float(request.args.get('latitude', 0))  # 纬度
-        max_distance = float(request.args.get('max_distance', 1000))  # 最大距离（米），默认1000米
-        limit = int(request.args.get('limit', 10))  # 结果数量限制，默认10个
+        longitude = float(args.get('longitude', 0))  # 经度
+        latitude = float(args.get('latitude', 0))  # 纬度
+        max_distance = float(args.get('max_distance', 1000))  # 最大距离（米），默认1000米
+        # 结果数量限制，默认10个
+        # $limit阶段不接受0或负数，限制在1到NEARBY_MAX_LIMIT之间
+        limit = min(max(int(args.get('limit', 10)), 1), NEARBY_MAX_LIMIT)
         
         # 验证经纬度范围
         # 经度范围：-180（西经180度）到180（东经180度）
@@ -346,34 +818,38 @@ def get_nearby_devices():
         if not (-180 <= longitude <= 180) or not (-90 <= latitude <= 90):
             return jsonify({'success': False, 'error': '经纬度范围错误'}), 400
         
-        # 构建MongoDB地理位置查询
-        # $near: MongoDB地理位置查询操作符
-        # 需要location字段上有2dsphere索引才能使用
-        query = {
-            'location': {
-                '$near': {
-                    '$geometry': {
-                        'type': 'Point',  # GeoJSON类型：点
-                        'coordinates': [longitude, latitude]  # [经度, 纬度]
-                    },
-                    '$maxDistance': max_distance  # 最大距离（米）
-                }
-            }
+        # 构建$geoNear聚合管道
+        # $geoNear必须是管道的第一个阶段，需要location字段上有2dsphere索引
+        # query: 状态筛选在地理位置扫描过程中直接过滤，而不是扫描后再过滤
+        # distanceField: 每个结果附带与中心点的距离（米），无需额外计算
+        # $geoNear的结果按距离从近到远排序，$limit限制结果数量（结果已按距离排序，无需再添加$sort）
+        # （MongoDB 4.2起$geoNear不再支持limit选项，需使用$limit阶段）
+        geo_near = {
+            'near': {
+                'type': 'Point',  # GeoJSON类型：点
+                'coordinates': [longitude, latitude]  # [经度, 纬度]
+            },
+            'key': 'location',  # 指定使用location字段上的2dsphere索引
+            'distanceField': 'distance',  # 距离字段名（米）
+            'maxDistance': max_distance,  # 最大距离（米）
+            'spherical': True  # 按球面计算距离
         }
         
         # 可选的状态过滤
         # 可以同时使用地理位置查询和状态筛选
-        status = request.args.get('status')
+        status = args.get('status')
         if status:
-            query['status'] = status
-        
-        # 执行查询
-        # find()查询后使用limit()限制结果数量
-        # $near查询的结果默认按距离从近到远排序
-        devices = list(devices_collection.find(query).limit(limit))
-        
-        # 转换ObjectId为字符串
-        devices = objectid_to_str(devices)
+            geo_near['query'] = {'status': status}
+        
+        # 投影只保留需要的字段，并附带距离
+        projection = dict(build_projection(args.get('fields'), DEVICE_LIST_PROJECTION),
+                          distance=1)
+        pipeline = [
+            {'$geoNear': geo_near},
+            {'$limit': limit},
+            {'$project': projection}
+        ]
+        devices = list(devices_collection.aggregate(pipeline))
         
         # 返回成功响应
         return jsonify({
@@ -390,6 +866,7 @@ def get_nearby_devices():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @bp.route('/stats', methods=['GET'])
+@cache.cached(timeout=30, make_cache_key=_device_cache_key)  # 统计结果缓存30秒
 def get_device_stats():
     """
     获取设备统计信息接口（MongoDB聚合查询）
@@ -413,51 +890,25 @@ def get_device_stats():
                 }
             }
     
-    MongoDB聚合管道说明：
-    1. $group: 按指定字段分组，统计每组数量
-    2. $sum: 求和操作，$sum: 1 表示计数
-    3. $sort: 排序，-1表示降序
+    统计数据来自device_stats集合中增量维护的统计文档，只需一次find_one；
+    统计文档不存在、已过期或已超过STATS_MAX_AGE时，使用$facet聚合管道重新生成（见_rebuild_stats）。
     """
     try:
-        # ==================== 按设备类型统计 ====================
-        # 使用聚合管道按type字段分组，统计每种类型的设备数量
-        type_stats = list(devices_collection.aggregate([
-            {
-                '$group': {
-                    '_id': '$type',  # 按type字段分组
-                    'count': {'$sum': 1}  # 统计每组数量（$sum: 1表示计数）
-                }
-            },
-            {
-                '$sort': {'count': -1}  # 按数量降序排序
-            }
-        ]))
-        
-        # ==================== 按设备状态统计 ====================
-        # 使用聚合管道按status字段分组，统计每种状态的设备数量
-        status_stats = list(devices_collection.aggregate([
-            {
-                '$group': {
-                    '_id': '$status',  # 按status字段分组
-                    'count': {'$sum': 1}  # 统计每组数量
-                }
-            },
-            {
-                '$sort': {'count': -1}  # 按数量降序排序
-            }
-        ]))
+        stats = stats_collection.find_one({'_id': STATS_DOC_ID})
+        if stats is None or stats['updated_at'] < datetime.utcnow() - STATS_MAX_AGE:
+            stats = _rebuild_stats()
         
-        # ==================== 总设备数 ====================
-        # 统计集合中的文档总数
-        total_devices = devices_collection.count_documents({})
+        total_devices = stats['total']
+        type_stats = _stats_to_list(stats['by_type'])
+        status_stats = _stats_to_list(stats['by_status'])
         
         # 返回成功响应
         return jsonify({
             'success': True,
             'data': {
                 'total': total_devices,  # 总设备数
-                'by_type': objectid_to_str(type_stats),  # 按类型统计结果
-                'by_status': objectid_to_str(status_stats)  # 按状态统计结果
+                'by_type': type_stats,  # 按类型统计结果
+                'by_status': status_stats  # 按状态统计结果
             }
         })
         
@@ -4,24 +4,31 @@
 本模块实现了设备日志的CRUD操作、全文搜索和统计分析功能。
 提供以下API接口：
 1. GET /api/logs - 查询日志列表（支持多条件筛选和分页）
-2. POST /api/logs - 创建新日志
+2. POST /api/logs - 创建新日志（写入缓冲区，批量入库）
 3. DELETE /api/logs/<log_id> - 删除日志
 4. GET /api/logs/stats - 获取日志统计信息（聚合查询）
 5. GET /api/logs/search - 全文搜索日志（文本索引）
+6. POST /api/logs/flush - 立即将当前worker进程缓冲区中的日志写入数据库
+7. POST /api/logs/bulk - 批量创建日志（一次请求写入多条日志）
 
 MongoDB特色功能：
 - 使用TTL索引自动清理90天前的日志
 - 使用文本索引实现全文搜索
 - 使用聚合管道进行复杂的数据分析
 - 支持时间序列数据的按小时聚合
+- 使用insert_many批量写入日志，减少网络往返
+- 按ESR规则设计复合索引，日志列表支持游标分页
 
 作者: 数据库系统课程项目小组
 """
 
 from flask import Blueprint, request, jsonify
-from pymongo import MongoClient
-from datetime import datetime, timedelta
-import os
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError, OperationFailure
+from datetime import datetime
+import atexit
+import logging
+import threading
 from bson import ObjectId
 from bson.errors import InvalidId
 
@@ -30,52 +37,275 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from db import db
+from extensions import cache
 from models import DeviceLog
-from utils import objectid_to_str, build_query_filters, parse_datetime
+from utils import build_query_filters, build_projection, parse_datetime
 
 # ==================== Flask蓝图初始化 ====================
 bp = Blueprint('logs', __name__)
 
-# ==================== MongoDB连接配置 ====================
-MONGO_HOST = os.getenv('MONGO_HOST', 'localhost')
-MONGO_PORT = int(os.getenv('MONGO_PORT', 27017))
-MONGO_USERNAME = os.getenv('MONGO_USERNAME', 'admin')
-MONGO_PASSWORD = os.getenv('MONGO_PASSWORD', 'admin123')
-MONGO_DATABASE = os.getenv('MONGO_DATABASE', 'smart_home')
+# 后台写入线程没有应用上下文，无法使用current_app，
+# 蓝图注册时记下应用的logger（注册前使用模块logger）
+_logger = logging.getLogger(__name__)
 
-if MONGO_USERNAME and MONGO_PASSWORD:
-    MONGO_URI = f"mongodb://{MONGO_USERNAME}:{MONGO_PASSWORD}@{MONGO_HOST}:{MONGO_PORT}/{MONGO_DATABASE}?authSource=admin"
-else:
-    MONGO_URI = f"mongodb://{MONGO_HOST}:{MONGO_PORT}/{MONGO_DATABASE}"
+@bp.record_once
+def _use_app_logger(state):
+    """蓝图注册到应用时改用app.logger记录后台写入失败"""
+    global _logger
+    _logger = state.app.logger
 
-client = MongoClient(MONGO_URI)
-db = client[MONGO_DATABASE]
+# ==================== MongoDB集合 ====================
+# 使用db.py中创建的共享客户端（整个应用共用一个连接池）
 # 获取device_logs集合对象，用于日志数据的增删改查
 logs_collection = db.device_logs
 
+# 日志保留时间：TTL索引自动删除90天前的日志
+LOG_TTL_SECONDS = 90 * 24 * 60 * 60
+
+def ensure_indexes():
+    """
+    确保device_logs集合上的分页查询索引存在
+    
+    在应用启动并确认MongoDB连接成功后调用，已存在的相同索引不会重复创建。
+    日志列表按(timestamp, _id)倒序分页，索引按ESR规则（等值-排序-范围）设计，
+    MongoDB可以直接按索引顺序返回结果，无需在内存中排序。
+    
+    索引说明：
+    - timestamp_ttl_idx: TTL索引，自动删除90天前的日志（与data/init_db.js一致）
+    - timestamp_id_idx: 无筛选条件时的日志列表排序和游标分页
+    - device_timestamp_idx: 按设备ID筛选日志并按时间排序/统计
+    - log_type_timestamp_idx: 按日志类型筛选（等值），再按时间排序/范围分页
+    - device_type_timestamp_idx: 按设备ID+日志类型筛选（等值），再按时间排序/范围分页；
+      也覆盖按设备统计所需的全部字段
+    - log_content_text_idx: 日志内容全文搜索索引（$text查询必需）
+    """
+    logs_collection.create_index([('timestamp', 1)], expireAfterSeconds=LOG_TTL_SECONDS,
+                                 name='timestamp_ttl_idx')
+    logs_collection.create_index([('timestamp', -1), ('_id', -1)], name='timestamp_id_idx')
+    logs_collection.create_index([('device_id', 1), ('timestamp', -1)], name='device_timestamp_idx')
+    logs_collection.create_index([('log_type', 1), ('timestamp', -1), ('_id', -1)],
+                                 name='log_type_timestamp_idx')
+    logs_collection.create_index(
+        [('device_id', 1), ('log_type', 1), ('timestamp', -1), ('_id', -1)],
+        name='device_type_timestamp_idx'
+    )
+    # 一个集合只能有一个文本索引，已存在其他定义的文本索引时会抛出OperationFailure，因此放在最后创建
+    logs_collection.create_index(
+        [('content.message', 'text'), ('content.details', 'text')],
+        name='log_content_text_idx'
+    )
+
+# ==================== 日志校验 ====================
+LOG_REQUIRED_FIELDS = ('device_id', 'log_type', 'message')  # 创建日志的必填字段
+LOG_BULK_MAX_SIZE = 1000  # 批量创建接口单次最多提交的日志数量
+
+def _validate_log(data):
+    """
+    校验创建日志的请求数据
+    
+    Args:
+        data: 单条日志的请求数据
+    
+    Returns:
+        Optional[str]: 校验失败时返回错误信息，通过时返回None
+    """
+    if not isinstance(data, dict):
+        return '日志数据格式错误'
+    for field in LOG_REQUIRED_FIELDS:
+        if field not in data:
+            return f'缺少必填字段: {field}'
+    return None
+
+# ==================== 分页配置 ====================
+MAX_PER_PAGE = 500  # 日志列表和全文搜索每页最多返回的日志数量
+LOG_TOTAL_TTL = 10  # 带筛选条件的日志总数的缓存时间（秒）
+
+# ==================== 全文搜索配置 ====================
+SEARCH_MAX_SKIP = 1000  # 全文搜索允许跳过的最大文档数，更深的翻页需要缩小搜索范围
+
+# ==================== 日志写入缓冲 ====================
+# 日志写入频繁且单条很小，逐条insert_one时每条日志都要付出一次网络往返
+# 这里先把日志放入内存缓冲区，达到批量大小或等待时间到期后再用insert_many一次写入
+LOG_BUFFER_SIZE = 1000  # 缓冲区达到该数量时立即写入
+LOG_FLUSH_INTERVAL = 0.1  # 缓冲区中的日志最长等待时间（秒）
+
+_LOG_BUFFER = []  # 待写入的日志文档
+_LOG_LOCK = threading.Lock()  # 保护缓冲区和定时器（Flask可能多线程处理请求）
+_flush_timer = None  # 当前等待中的定时刷新器
+
+# 缓冲写入使用w=0（不等待服务端确认），批量写入不阻塞请求线程
+_buffered_logs_collection = logs_collection.with_options(write_concern=WriteConcern(w=0))
+
+def _drain_buffer():
+    """
+    取出缓冲区中的全部日志并取消等待中的定时器（调用方需持有_LOG_LOCK）
+    
+    Returns:
+        list: 待写入的日志文档列表
+    """
+    global _flush_timer
+    if _flush_timer is not None:
+        _flush_timer.cancel()
+        _flush_timer = None
+    batch = _LOG_BUFFER[:]
+    _LOG_BUFFER.clear()
+    return batch
+
+def _write_batch(batch):
+    """
+    批量写入一批日志
+    
+    ordered=False: 服务端无需按顺序逐条写入，单条失败也不影响其他日志
+    写入在锁外执行，避免阻塞其他请求向缓冲区追加日志
+    
+    w=0写入只能发现网络错误等客户端异常，服务端拒绝写入时不会有任何提示；
+    发现异常时这批日志已经丢失（客户端已收到202和日志ID），只能记录错误日志。
+    """
+    try:
+        _buffered_logs_collection.insert_many(batch, ordered=False)
+    except Exception:
+        _logger.exception('日志批量写入失败，%d条日志已丢失', len(batch))
+
+def buffer_log(log):
+    """
+    将日志放入写入缓冲区
+    
+    缓冲区达到LOG_BUFFER_SIZE时立即批量写入；
+    否则启动定时器，最多等待LOG_FLUSH_INTERVAL秒后写入。
+    
+    Args:
+        log: 日志文档（由DeviceLog.create创建）
+    """
+    global _flush_timer
+    batch = None
+    with _LOG_LOCK:
+        _LOG_BUFFER.append(log)
+        if len(_LOG_BUFFER) >= LOG_BUFFER_SIZE:
+            batch = _drain_buffer()
+        elif _flush_timer is None:
+            _flush_timer = threading.Timer(LOG_FLUSH_INTERVAL, flush_logs)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+    if batch:
+        _write_batch(batch)
+
+def flush_logs():
+    """
+    立即将缓冲区中的全部日志写入数据库
+    
+    Returns:
+        int: 本次写入的日志数量
+    """
+    with _LOG_LOCK:
+        batch = _drain_buffer()
+    if batch:
+        _write_batch(batch)
+    return len(batch)
+
+# 进程退出前写入缓冲区中剩余的日志
+atexit.register(flush_logs)
+
 @bp.route('', methods=['GET'])
 def get_logs():
-    """查询日志"""
+    """
+    查询日志
+    
+    查询参数：
+    - page: 页码（可选，默认：1）
+    - per_page: 每页数量（可选，默认：50，最大：500）
+    - device_id/log_type/start_time/end_time: 筛选条件（见build_query_filters）
+    - before/before_id: 游标分页参数（可选，取自上一页返回的pagination.next_cursor）
+      游标格式错误时返回400（不会回退到按页码分页）
+      提供游标时按游标位置继续向后读取，不再使用skip，翻到很深的页也不需要重新扫描前面的日志
+    - fields: 返回字段（可选，逗号分隔，如：device_id,log_type,timestamp，默认返回完整日志）
+    - include_total: 是否统计总数（可选，默认：true）
+      无限滚动等只需要知道是否还有下一页的场景可传false，省去一次计数查询
+    
+    Returns:
+        JSON响应:
+            {
+                'success': True,
+                'data': [日志列表，按时间倒序],
+                'pagination': {
+                    'page': 当前页码,
+                    'per_page': 每页数量,
+                    'total': 总数量（include_total=false时为None）,
+                    'pages': 总页数（include_total=false时为None）,
+                    'has_more': 是否还有下一页,
+                    'next_cursor': {'before': 时间戳, 'before_id': 日志ID}（没有下一页时为None）
+                }
+            }
+    """
     try:
+        # 查询参数只转换一次为普通字典，后续直接按字典读取
+        args = request.args.to_dict()
+        
         # 获取查询参数
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 50))
+        # 每页数量限制在MAX_PER_PAGE以内，避免一次请求把大量日志读入内存
+        page = max(int(args.get('page', 1)), 1)
+        per_page = min(max(int(args.get('per_page', 50)), 1), MAX_PER_PAGE)
         skip = (page - 1) * per_page
         
         # 构建查询过滤器
-        filters = build_query_filters(request.args.to_dict())
+        filters = build_query_filters(args)
+        
+        # 游标分页：从上一页最后一条日志之后继续读取
+        # 排序键为(timestamp, _id)，时间戳相同的日志按_id区分，保证不重复也不遗漏
+        query = filters
+        before = parse_datetime(args.get('before'))
+        if args.get('before') and before is None:
+            # 游标无法解析时返回错误，不回退到按页码分页（否则会返回与游标无关的一页）
+            return jsonify({'success': False, 'error': '游标时间格式错误'}), 400
+        if before:
+            cursor_filter = {'timestamp': {'$lt': before}}
+            before_id = args.get('before_id')
+            if before_id:
+                try:
+                    cursor_filter = {'$or': [
+                        cursor_filter,
+                        {'timestamp': before, '_id': {'$lt': ObjectId(before_id)}}
+                    ]}
+                except InvalidId:
+                    return jsonify({'success': False, 'error': '日志ID格式错误'}), 400
+            query = {'$and': [filters, cursor_filter]} if filters else cursor_filter
+            skip = 0
+        
+        # 投影：只取需要的字段，减少BSON解码和JSON编码的数据量
+        # 游标需要timestamp字段，指定返回字段时也总是包含timestamp
+        projection = build_projection(args.get('fields'))
+        if projection:
+            projection['timestamp'] = 1
         
         # 查询日志
-        logs = list(logs_collection.find(filters)
-                   .sort('timestamp', -1)
+        # 多读取一条用于判断是否还有下一页，不需要额外的计数查询
+        logs = list(logs_collection.find(query, projection)
+                   .sort([('timestamp', -1), ('_id', -1)])
                    .skip(skip)
-                   .limit(per_page))
+                   .limit(per_page + 1))
+        has_more = len(logs) > per_page
+        del logs[per_page:]
         
         # 获取总数
-        total = logs_collection.count_documents(filters)
+        # 没有筛选条件时使用集合元数据中的文档数，不需要扫描
+        total = pages = None
+        if args.get('include_total', 'true').lower() != 'false':
+            if filters:
+                # 翻页时筛选条件不变，总数缓存LOG_TOTAL_TTL秒，后续页面只需执行一次分页查询
+                cache_key = f'logs:total:{sorted(filters.items())!r}'
+                total = cache.get(cache_key)
+                if total is None:
+                    total = logs_collection.count_documents(filters)
+                    cache.set(cache_key, total, timeout=LOG_TOTAL_TTL)
+            else:
+                total = logs_collection.estimated_document_count()
+            pages = (total + per_page - 1) // per_page
         
-        # 转换ObjectId为字符串
-        logs = objectid_to_str(logs)
+        # 下一页游标
+        next_cursor = None
+        if has_more:
+            last = logs[-1]
+            next_cursor = {'before': last['timestamp'].isoformat(), 'before_id': str(last['_id'])}
         
         return jsonify({
             'success': True,
@@ -84,26 +314,34 @@ def get_logs():
                 'page': page,
                 'per_page': per_page,
                 'total': total,
-                'pages': (total + per_page - 1) // per_page
+                'pages': pages,
+                'has_more': has_more,
+                'next_cursor': next_cursor
             }
         })
         
+    except ValueError as e:
+        # 分页参数无法转换为整数
+        return jsonify({'success': False, 'error': f'参数格式错误: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @bp.route('', methods=['POST'])
 def create_log():
-    """创建日志"""
+    """
+    创建日志（放入写入缓冲区，后台批量写入数据库）
+    
+    返回202和预先生成的日志ID只表示日志已被接收，不保证写入成功：
+    后台使用w=0批量写入，写入失败时日志丢失，只在服务端记录错误日志。
+    需要确认写入结果时使用批量创建接口POST /api/logs/bulk（等待数据库确认）。
+    """
     try:
         data = request.get_json()
         
         # 验证必填字段
-        if 'device_id' not in data:
-            return jsonify({'success': False, 'error': '缺少必填字段: device_id'}), 400
-        if 'log_type' not in data:
-            return jsonify({'success': False, 'error': '缺少必填字段: log_type'}), 400
-        if 'message' not in data:
-            return jsonify({'success': False, 'error': '缺少必填字段: message'}), 400
+        error = _validate_log(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
         
         # 解析时间戳
         timestamp = parse_datetime(data.get('timestamp'))
@@ -117,18 +355,124 @@ def create_log():
             timestamp=timestamp
         )
         
-        # 插入数据库
-        result = logs_collection.insert_one(log)
+        # 预先生成_id，日志放入缓冲区后即可返回ID，无需等待写入完成
+        log['_id'] = ObjectId()
+        
+        # 放入写入缓冲区，由后台批量写入数据库
+        buffer_log(log)
         
+        # 202 Accepted: 日志已接收，稍后（最多LOG_FLUSH_INTERVAL秒）写入数据库
         return jsonify({
             'success': True,
-            'message': '日志创建成功',
-            'id': str(result.inserted_id)
-        }), 201
+            'message': '日志已提交',
+            'id': str(log['_id'])
+        }), 202
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@bp.route('/bulk', methods=['POST'])
+def create_logs_bulk():
+    """
+    批量创建日志接口
+    
+    设备集中上报日志时，一次请求提交多条日志，用一次insert_many写入，
+    避免每条日志各自付出一次HTTP请求和数据库往返。
+    与单条接口不同，批量写入会等待数据库确认，可以返回每条日志的写入结果。
+    
+    查询参数：
+    - async: 为1时使用w=0写入（不等待数据库确认），立即返回202，
+             适合可以容忍少量丢失的高频上报；此时无法返回逐条写入结果
+    
+    请求体（JSON数组，最多LOG_BULK_MAX_SIZE条）：
+    [
+        {"device_id": "DEV0001", "log_type": "info", "message": "设备正常运行", "details": {}},
+        ...
+    ]
+    
+    Returns:
+        JSON响应:
+            {
+                'success': True,  // 全部写入成功时为True
+                'inserted': 写入成功的数量,
+                'failed': [{'index': 数组下标, 'error': '错误信息'}, ...]
+            }
+            至少写入一条日志时返回201；全部写入失败时返回400
+            任意一条日志缺少必填字段时不写入任何日志，返回400和每条日志的校验错误
+            async=1时返回202和提交的数量accepted，不返回inserted/failed（写入结果未知）
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, list) or not data:
+            return jsonify({'success': False, 'error': '请求体必须是非空的日志数组'}), 400
+        if len(data) > LOG_BULK_MAX_SIZE:
+            return jsonify({'success': False, 'error': f'单次最多提交{LOG_BULK_MAX_SIZE}条日志'}), 400
+        
+        # 先校验全部日志，有错误时整批拒绝
+        failed = []
+        for index, item in enumerate(data):
+            error = _validate_log(item)
+            if error:
+                failed.append({'index': index, 'error': error})
+        if failed:
+            return jsonify({'success': False, 'error': '日志校验失败', 'failed': failed}), 400
+        
+        # 整批日志共用一次获取的当前时间（未提供timestamp的日志）
+        now = datetime.utcnow()
+        logs = [
+            DeviceLog.create(
+                device_id=item['device_id'],
+                log_type=item['log_type'],
+                message=item['message'],
+                details=item.get('details', {}),
+                timestamp=parse_datetime(item.get('timestamp')) or now
+            )
+            for item in data
+        ]
+        
+        # ordered=False: 某条日志写入失败时继续写入其余日志，服务端也可以并行处理
+        if request.args.get('async') == '1':
+            # 与单条接口的缓冲写入相同，使用w=0的集合，发出请求后不等待服务端确认
+            # 拿不到写入结果，因此只报告提交的数量，不报告inserted/failed
+            _buffered_logs_collection.insert_many(logs, ordered=False)
+            return jsonify({
+                'success': True,
+                'message': '日志已提交',
+                'accepted': len(logs)
+            }), 202
+        
+        try:
+            result = logs_collection.insert_many(logs, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted = e.details.get('nInserted', 0)
+            failed = [{'index': err['index'], 'error': err['errmsg']}
+                      for err in e.details.get('writeErrors', [])]
+        
+        return jsonify({
+            'success': not failed,
+            'inserted': inserted,
+            'failed': failed
+        }), 201 if inserted else 400
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/flush', methods=['POST'])
+def flush_log_buffer():
+    """
+    立即写入缓冲区中的日志（用于测试或需要立即查询到新日志的场景）
+    
+    写入缓冲区是每个worker进程各自的内存缓冲区，本接口只写入处理这次请求的进程的缓冲区；
+    多worker部署时其他进程中的日志仍在LOG_FLUSH_INTERVAL秒内由各自的定时器写入。
+    测试中需要可靠地查询到刚创建的日志时，应使用单worker运行，或等待LOG_FLUSH_INTERVAL后再查询。
+    """
+    try:
+        count = flush_logs()
+        return jsonify({'success': True, 'flushed': count})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @bp.route('/<log_id>', methods=['DELETE'])
 def delete_log(log_id):
     """删除日志"""
@@ -149,7 +493,19 @@ def delete_log(log_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# 影响统计结果的查询参数
+LOG_STATS_ARGS = ('start_time', 'end_time', 'device_id')
+
+def _log_stats_cache_key(*args, **kwargs):
+    """
+    日志统计的缓存键：只由影响统计结果的查询参数组成
+    
+    其他参数（如前端附加的时间戳）不会让相同的统计各占一份缓存。
+    """
+    return 'logs:stats:' + '|'.join(request.args.get(name, '') for name in LOG_STATS_ARGS)
+
 @bp.route('/stats', methods=['GET'])
+@cache.cached(timeout=30, make_cache_key=_log_stats_cache_key)  # 按时间范围、设备ID分别缓存30秒
 def get_log_stats():
     """
     获取日志统计信息接口（MongoDB聚合查询）
@@ -177,11 +533,16 @@ def get_log_stats():
                     'device_frequency': [设备日志频率统计]
                 }
             }
+    
+    四项统计在一次$facet聚合中完成（共用同一个$match筛选）。
+    统计面板会定时刷新，相同参数的请求在30秒内直接返回缓存结果，不重复执行聚合。
     """
     try:
+        args = request.args.to_dict()
+        
         # ==================== 获取时间范围参数 ====================
-        start_time = parse_datetime(request.args.get('start_time'))
-        end_time = parse_datetime(request.args.get('end_time'))
+        start_time = parse_datetime(args.get('start_time'))
+        end_time = parse_datetime(args.get('end_time'))
         
         # ==================== 构建聚合管道的匹配条件 ====================
         match_conditions = {}
@@ -195,104 +556,132 @@ def get_log_stats():
             match_conditions['timestamp'] = time_filter
         
         # 设备ID过滤
-        device_id = request.args.get('device_id')
+        device_id = args.get('device_id')
         if device_id:
             match_conditions['device_id'] = device_id
         
-        # ==================== 1. 按日志类型统计 ====================
-        # 统计每种日志类型（info/warning/error/status_change）的数量
-        type_stats = list(logs_collection.aggregate([
-            {'$match': match_conditions},  # 匹配条件：时间范围和设备ID
-            {'$group': {
-                '_id': '$log_type',  # 按log_type字段分组
-                'count': {'$sum': 1}  # 统计每组数量
-            }},
-            {'$sort': {'count': -1}}  # 按数量降序排序
-        ]))
-        
-        # ==================== 2. 按设备统计日志数量 ====================
-        # 统计每个设备的日志数量，返回前10个日志最多的设备
-        device_stats = list(logs_collection.aggregate([
-            {'$match': match_conditions},
-            {'$group': {
-                '_id': '$device_id',  # 按device_id字段分组
-                'count': {'$sum': 1}  # 统计每组数量
-            }},
-            {'$sort': {'count': -1}},  # 按数量降序排序
-            {'$limit': 10}  # 限制返回前10条
-        ]))
-        
-        # ==================== 3. 按时间段聚合（按小时） ====================
-        # 将日志按小时分组统计，用于时间序列分析
-        # 使用MongoDB日期操作符提取年、月、日、小时
-        hourly_stats = list(logs_collection.aggregate([
-            {'$match': match_conditions},
-            {'$group': {
-                '_id': {
-                    'year': {'$year': '$timestamp'},  # 提取年份
-                    'month': {'$month': '$timestamp'},  # 提取月份（1-12）
-                    'day': {'$dayOfMonth': '$timestamp'},  # 提取日期（1-31）
-                    'hour': {'$hour': '$timestamp'}  # 提取小时（0-23）
-                },
-                'count': {'$sum': 1}  # 统计每小时的数量
-            }},
-            {'$sort': {'_id': 1}},  # 按时间升序排序
-            {'$limit': 24}  # 限制返回24条（最近24小时）
-        ]))
-        
-        # ==================== 4. 计算平均日志频率（按设备） ====================
-        # 计算每个设备的平均日志频率（条/小时）
-        # 频率 = 日志总数 / (最后一条日志时间 - 第一条日志时间)
-        device_frequency = list(logs_collection.aggregate([
-            {'$match': match_conditions},
-            {'$group': {
-                '_id': '$device_id',
-                'first_log': {'$min': '$timestamp'},  # 第一条日志时间
-                'last_log': {'$max': '$timestamp'},  # 最后一条日志时间
-                'count': {'$sum': 1}  # 日志总数
-            }},
-            {'$project': {
-                'device_id': '$_id',
-                'count': 1,
-                # 计算时间跨度（小时）
-                # $subtract: 计算时间差（毫秒）
-                # $divide: 除以3600000（毫秒转小时）
-                'duration_hours': {
-                    '$divide': [
-                        {'$subtract': ['$last_log', '$first_log']},
-                        3600000  # 毫秒转小时
-                    ]
-                },
-                # 计算日志频率（条/小时）
-                # $cond: 条件表达式，如果时间跨度>0则计算频率，否则为0
-                'frequency': {
-                    '$cond': {
-                        'if': {'$gt': [{'$subtract': ['$last_log', '$first_log']}, 0]},
-                        'then': {
+        # ==================== 单次聚合完成全部统计 ====================
+        # 四项统计的匹配条件相同：先用$match筛选（可以使用索引），
+        # 再用$facet在同一批文档上执行四个子管道，只需一次网络往返、一次扫描
+        pipeline = []
+        aggregate_options = {}
+        if match_conditions:
+            pipeline.append({'$match': match_conditions})  # 匹配条件：时间范围和设备ID
+            # 按键模式指定ensure_indexes创建的索引，避免查询优化器每次重新评估候选索引
+            # 按设备筛选时使用(device_id, log_type, timestamp)索引：它包含下面$project保留的全部字段，
+            # 查询可以只读索引完成（覆盖查询），不必读取日志文档；只按时间筛选时使用时间戳索引
+            aggregate_options['hint'] = (
+                {'device_id': 1, 'log_type': 1, 'timestamp': -1, '_id': -1} if device_id
+                else {'timestamp': -1, '_id': -1}
+            )
+        # 没有筛选条件时不添加$match，也不指定索引：需要读取全部日志，直接扫描集合比遍历索引更快
+        # 四项统计只用到设备ID、日志类型和时间戳，先去掉日志内容（content）等其他字段，
+        # 减少流入$facet各子管道的数据量
+        pipeline.append({'$project': {'_id': 0, 'device_id': 1, 'log_type': 1, 'timestamp': 1}})
+        pipeline.append(
+            {'$facet': {
+                # ==================== 1. 按日志类型统计 ====================
+                # 统计每种日志类型（info/warning/error/status_change）的数量
+                'by_type': [
+                    {'$group': {
+                        '_id': '$log_type',  # 按log_type字段分组
+                        'count': {'$sum': 1}  # 统计每组数量
+                    }},
+                    {'$sort': {'count': -1}}  # 按数量降序排序
+                ],
+                
+                # ==================== 2. 按设备统计日志数量 ====================
+                # 统计每个设备的日志数量，返回前10个日志最多的设备
+                'by_device': [
+                    {'$group': {
+                        '_id': '$device_id',  # 按device_id字段分组
+                        'count': {'$sum': 1}  # 统计每组数量
+                    }},
+                    {'$sort': {'count': -1}},  # 按数量降序排序
+                    {'$limit': 10}  # 限制返回前10条
+                ],
+                
+                # ==================== 3. 按时间段聚合（按小时） ====================
+                # 将日志按小时分组统计，用于时间序列分析
+                # 使用MongoDB日期操作符提取年、月、日、小时
+                'hourly': [
+                    {'$group': {
+                        '_id': {
+                            'year': {'$year': '$timestamp'},  # 提取年份
+                            'month': {'$month': '$timestamp'},  # 提取月份（1-12）
+                            'day': {'$dayOfMonth': '$timestamp'},  # 提取日期（1-31）
+                            'hour': {'$hour': '$timestamp'}  # 提取小时（0-23）
+                        },
+                        'count': {'$sum': 1}  # 统计每小时的数量
+                    }},
+                    # 按时间降序取前24条（最近24个有日志的小时），
+                    # $sort紧跟$limit时服务端只保留前24条（top-k），无需对全部小时分组完整排序
+                    {'$sort': {'_id': -1}},
+                    {'$limit': 24}
+                ],
+                
+                # ==================== 4. 计算平均日志频率（按设备） ====================
+                # 计算每个设备的平均日志频率（条/小时）
+                # 频率 = 日志总数 / (最后一条日志时间 - 第一条日志时间)
+                'device_frequency': [
+                    {'$group': {
+                        '_id': '$device_id',
+                        'first_log': {'$min': '$timestamp'},  # 第一条日志时间
+                        'last_log': {'$max': '$timestamp'},  # 最后一条日志时间
+                        'count': {'$sum': 1}  # 日志总数
+                    }},
+                    # 计算时间跨度（小时），只计算一次，下面的频率计算直接引用
+                    # $subtract: 计算时间差（毫秒）
+                    # $divide: 除以3600000（毫秒转小时）
+                    {'$addFields': {
+                        'duration_hours': {
                             '$divide': [
-                                '$count',  # 日志总数
-                                {'$divide': [
-                                    {'$subtract': ['$last_log', '$first_log']},
-                                    3600000
-                                ]}  # 时间跨度（小时）
+                                {'$subtract': ['$last_log', '$first_log']},
+                                3600000  # 毫秒转小时
                             ]
-                        },
-                        'else': 0  # 如果时间跨度为0，频率为0
-                    }
-                }
-            }},
-            {'$sort': {'frequency': -1}},  # 按频率降序排序
-            {'$limit': 10}  # 限制返回前10条
-        ]))
+                        }
+                    }},
+                    {'$project': {
+                        'device_id': '$_id',
+                        'count': 1,
+                        'duration_hours': 1,
+                        # 计算日志频率（条/小时）
+                        # $cond: 条件表达式，如果时间跨度>0则计算频率，否则为0
+                        'frequency': {
+                            '$cond': {
+                                'if': {'$gt': ['$duration_hours', 0]},
+                                'then': {'$divide': ['$count', '$duration_hours']},
+                                'else': 0  # 如果时间跨度为0，频率为0
+                            }
+                        }
+                    }},
+                    {'$sort': {'frequency': -1}},  # 按频率降序排序
+                    {'$limit': 10}  # 限制返回前10条
+                ]
+            }}
+        )
+        try:
+            result = next(logs_collection.aggregate(pipeline, **aggregate_options))
+        except OperationFailure:
+            if not aggregate_options:
+                raise
+            # 索引创建失败时（ensure_indexes失败只打印警告）指定的索引不存在，
+            # 不指定索引重新执行，由查询优化器选择
+            result = next(logs_collection.aggregate(pipeline))
+        
+        type_stats = result['by_type']
+        device_stats = result['by_device']
+        hourly_stats = result['hourly'][::-1]  # 图表按时间升序展示
+        device_frequency = result['device_frequency']
         
         # 返回成功响应
         return jsonify({
             'success': True,
             'data': {
-                'by_type': objectid_to_str(type_stats),  # 按类型统计
-                'by_device': objectid_to_str(device_stats),  # 按设备统计
-                'hourly': objectid_to_str(hourly_stats),  # 按小时统计
-                'device_frequency': objectid_to_str(device_frequency)  # 设备频率统计
+                'by_type': type_stats,  # 按类型统计
+                'by_device': device_stats,  # 按设备统计
+                'hourly': hourly_stats,  # 按小时统计
+                'device_frequency': device_frequency  # 设备频率统计
             }
         })
         
@@ -310,7 +699,7 @@ def search_logs():
     查询参数：
     - keyword: 搜索关键词（必填）
     - page: 页码（可选，默认：1）
-    - per_page: 每页数量（可选，默认：50）
+    - per_page: 每页数量（可选，默认：50，最大：500）
     
     URL示例：
     - GET /api/logs/search?keyword=错误&page=1&per_page=20
@@ -320,8 +709,9 @@ def search_logs():
     - $search: 搜索关键词（支持多个关键词，空格分隔）
     - textScore: 相关性评分，用于排序
     - 结果按相关性评分降序排序
+    - $facet: 同一次聚合中返回当前页结果和匹配总数
     
-    注意：需要在MongoDB中创建文本索引：
+    注意：需要在MongoDB中创建文本索引（应用启动时由ensure_indexes创建）：
     db.device_logs.createIndex({
         "content.message": "text",
         "content.details": "text"
@@ -335,38 +725,55 @@ def search_logs():
                 'pagination': {
                     'page': 当前页码,
                     'per_page': 每页数量,
-                    'total': 总数量
+                    'total': 总数量,
+                    'pages': 总页数
                 }
             }
+    
+    注意：按相关性排序的结果无法使用游标分页，只允许跳过前SEARCH_MAX_SKIP条结果。
     """
     try:
+        args = request.args.to_dict()
+        
         # 获取搜索关键词
-        keyword = request.args.get('keyword', '')
+        keyword = args.get('keyword', '')
         if not keyword:
             return jsonify({'success': False, 'error': '缺少搜索关键词'}), 400
         
         # 获取分页参数
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 50))
+        # 每页数量限制在MAX_PER_PAGE以内，避免一次请求把大量日志读入内存
+        page = max(int(args.get('page', 1)), 1)
+        per_page = min(max(int(args.get('per_page', 50)), 1), MAX_PER_PAGE)
         skip = (page - 1) * per_page  # 计算跳过的文档数量
+        # skip需要逐条跳过前面的结果，页码越大越慢，超过上限时要求用户缩小搜索范围
+        if skip > SEARCH_MAX_SKIP:
+            return jsonify({
+                'success': False,
+                'error': f'只能查看前{SEARCH_MAX_SKIP}条搜索结果，请使用更精确的关键词'
+            }), 400
         
         # ==================== MongoDB全文搜索 ====================
-        # $text: MongoDB全文搜索操作符
+        # $text: MongoDB全文搜索操作符，总是使用文本索引，且必须位于管道的第一个$match阶段
         # $search: 搜索关键词（支持多个关键词，空格分隔，如："错误 设备"）
         # $meta: 'textScore' 获取相关性评分
-        logs = list(logs_collection.find(
-            {'$text': {'$search': keyword}},  # 全文搜索条件
-            {'score': {'$meta': 'textScore'}}  # 包含相关性评分字段
-        ).sort([('score', {'$meta': 'textScore'})])  # 按相关性评分降序排序
-         .skip(skip)  # 跳过前面的文档
-         .limit(per_page))  # 限制返回数量
-        
-        # 注意：这里简化处理，实际应该使用count_documents统计总数
-        # 但$text查询的count操作较复杂，这里使用返回结果的长度
-        total = len(logs)  # 简化处理
-        
-        # 转换ObjectId为字符串
-        logs = objectid_to_str(logs)
+        # 按相关性排序无论如何都要在内存中对全部匹配结果排序，
+        # 因此用$facet在同一次扫描中同时取出当前页和总数，不再单独执行count_documents
+        result = next(logs_collection.aggregate([
+            {'$match': {'$text': {'$search': keyword}}},  # 全文搜索条件
+            {'$addFields': {'score': {'$meta': 'textScore'}}},  # 包含相关性评分字段
+            {'$sort': {'score': -1}},  # 按相关性评分降序排序
+            {'$facet': {
+                'data': [
+                    {'$skip': skip},  # 跳过前面的文档
+                    {'$limit': per_page}  # 限制返回数量
+                ],
+                'total': [
+                    {'$count': 'n'}  # 匹配的总数量（没有匹配时为空数组）
+                ]
+            }}
+        ]))
+        logs = result['data']
+        total = result['total'][0]['n'] if result['total'] else 0
         
         # 返回成功响应
         return jsonify({
@@ -375,10 +782,13 @@ def search_logs():
             'pagination': {
                 'page': page,
                 'per_page': per_page,
-                'total': total
+                'total': total,
+                'pages': (total + per_page - 1) // per_page
             }
         })
         
+    except ValueError as e:
+        # 分页参数无法转换为整数
+        return jsonify({'success': False, 'error': f'参数格式错误: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
-
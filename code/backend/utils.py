@@ -1,62 +1,24 @@
 """
 工具函数模块
 
-本模块提供了一系列工具函数，用于处理MongoDB数据类型转换、
-日期时间解析、数据验证等通用功能。
+本模块提供了一系列工具函数，用于处理日期时间解析、数据验证等通用功能。
 
 主要功能：
-1. ObjectId转字符串：将MongoDB的ObjectId转换为JSON可序列化的字符串
-2. 日期时间解析：解析多种格式的日期时间字符串
-3. 地理位置验证：验证经纬度数据的有效性
-4. 查询过滤器构建：根据请求参数构建MongoDB查询过滤器
+1. 日期时间解析：解析多种格式的日期时间字符串
+2. 地理位置验证：验证经纬度数据的有效性
+3. 查询过滤器构建：根据请求参数构建MongoDB查询过滤器
+4. 投影构建：根据请求参数构建MongoDB字段投影
+5. 流式响应：逐个文档编码查询结果，不在内存中物化整个结果集
+
+ObjectId/datetime的JSON序列化由app.py中的MongoJSONProvider统一处理。
 
 作者: 数据库系统课程项目小组
 """
 
-from bson import ObjectId
+from flask import Response, current_app, stream_with_context
 from datetime import datetime
-from typing import Dict, Any, Optional
-
-def objectid_to_str(obj: Any) -> Any:
-    """
-    将MongoDB的ObjectId对象递归转换为字符串
-    
-    MongoDB文档中的_id字段是ObjectId类型，无法直接序列化为JSON。
-    此函数递归遍历数据结构，将所有ObjectId对象转换为字符串。
-    
-    支持的数据类型：
-    - ObjectId: 直接转换为字符串
-    - dict: 递归处理字典中的所有值
-    - list: 递归处理列表中的所有元素
-    - 其他类型: 原样返回
-    
-    Args:
-        obj: 需要转换的对象，可以是ObjectId、dict、list或其他类型
-    
-    Returns:
-        Any: 转换后的对象，ObjectId被转换为字符串
-    
-    示例:
-        >>> from bson import ObjectId
-        >>> doc = {'_id': ObjectId('507f1f77bcf86cd799439011'), 'name': 'test'}
-        >>> result = objectid_to_str(doc)
-        >>> result['_id']  # '507f1f77bcf86cd799439011'
-        
-        >>> nested = {'items': [{'_id': ObjectId('507f1f77bcf86cd799439011')}]}
-        >>> result = objectid_to_str(nested)
-        >>> result['items'][0]['_id']  # '507f1f77bcf86cd799439011'
-    """
-    # ObjectId类型：转换为字符串
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    # 字典类型：递归处理所有值
-    elif isinstance(obj, dict):
-        return {k: objectid_to_str(v) for k, v in obj.items()}
-    # 列表类型：递归处理所有元素
-    elif isinstance(obj, list):
-        return [objectid_to_str(item) for item in obj]
-    # 其他类型：原样返回
-    return obj
+from functools import lru_cache
+from typing import Dict, Any, Iterable, Optional
 
 def parse_datetime(date_str: Optional[str]) -> Optional[datetime]:
     """
@@ -89,32 +51,43 @@ def parse_datetime(date_str: Optional[str]) -> Optional[datetime]:
         >>> parse_datetime('invalid')  # None
         >>> parse_datetime(None)  # None
     """
-    # 空字符串或None直接返回None
-    if not date_str:
-        return None
-    try:
-        # 按顺序尝试多种日期时间格式
-        # 从最完整到最简单的格式，提高解析成功率
-        formats = [
-            '%Y-%m-%dT%H:%M:%S',  # ISO格式（带秒）
-            '%Y-%m-%dT%H:%M:%S.%f',  # ISO格式（带微秒）
-            '%Y-%m-%d %H:%M:%S',  # 标准格式（带秒）
-            '%Y-%m-%d %H:%M',  # 标准格式（不带秒，datetime-local转换后）
-            '%Y-%m-%dT%H:%M',  # ISO格式（不带秒，datetime-local原始格式）
-            '%Y-%m-%d'  # 仅日期
-        ]
-        # 遍历所有格式，尝试解析
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except ValueError:
-                # 当前格式不匹配，尝试下一个格式
-                continue
-        # 所有格式都失败，返回None
-        return None
-    except Exception:
-        # 发生其他异常（如类型错误），返回None
+    # 空字符串、None或非字符串直接返回None
+    if not date_str or not isinstance(date_str, str):
         return None
+    return _parse_datetime_cached(date_str)
+
+# 支持的日期时间格式及其字符串长度（0表示长度不固定）
+# 按前端实际传入的频率排序：前端把datetime-local的值转换为"YYYY-MM-DD HH:MM:SS"
+_DATETIME_FORMATS = (
+    ('%Y-%m-%d %H:%M:%S', 19),  # 标准格式（带秒，前端转换后的格式）
+    ('%Y-%m-%dT%H:%M:%S', 19),  # ISO格式（带秒）
+    ('%Y-%m-%dT%H:%M', 16),  # ISO格式（不带秒，datetime-local原始格式）
+    ('%Y-%m-%d %H:%M', 16),  # 标准格式（不带秒，datetime-local转换后）
+    ('%Y-%m-%d', 10),  # 仅日期
+    ('%Y-%m-%dT%H:%M:%S.%f', 0)  # ISO格式（带微秒，如日志列表的游标，微秒位数不固定）
+)
+
+@lru_cache(maxsize=4096)
+def _parse_datetime_cached(date_str: str) -> Optional[datetime]:
+    """
+    按格式列表解析日期时间字符串（结果按字符串缓存）
+    
+    前端翻页和定时刷新时会反复传入相同的时间范围参数，
+    缓存后相同的字符串只需解析一次（datetime对象不可变，可以安全共享）。
+    """
+    # 先只尝试长度与字符串一致的格式，避免大量必然失败的strptime调用（每次失败都会抛出异常）
+    # 长度不一致的格式放在最后尝试（strptime也接受不补零的写法，如'2024-1-1'）
+    size = len(date_str)
+    candidates = [fmt for fmt, length in _DATETIME_FORMATS if not length or length == size]
+    candidates += [fmt for fmt, length in _DATETIME_FORMATS if length and length != size]
+    for fmt in candidates:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            # 当前格式不匹配，尝试下一个格式
+            continue
+    # 所有格式都失败，返回None
+    return None
 
 def validate_location(location: Dict[str, float]) -> bool:
     """
@@ -148,22 +121,22 @@ def validate_location(location: Dict[str, float]) -> bool:
     # 检查是否为字典类型
     if not isinstance(location, dict):
         return False
-    # 检查是否包含必需的字段
-    if 'longitude' not in location or 'latitude' not in location:
-        return False
-    try:
-        # 尝试转换为浮点数
-        lon = float(location['longitude'])
-        lat = float(location['latitude'])
-        # 验证经纬度范围
-        # 经度范围：-180（西经180度）到180（东经180度）
-        # 纬度范围：-90（南纬90度）到90（北纬90度）
-        if not (-180 <= lon <= 180) or not (-90 <= lat <= 90):
+    # 缺少字段时get()返回None，后续float(None)会抛出TypeError
+    lon = location.get('longitude')
+    lat = location.get('latitude')
+    # 快速路径：前端提交的JSON数值通常已经是float，无需再转换
+    # 其他情况（整数、数字字符串等）再尝试转换为浮点数
+    if type(lon) is not float or type(lat) is not float:
+        try:
+            lon = float(lon)
+            lat = float(lat)
+        except (ValueError, TypeError):
+            # 缺少字段、转换失败或类型错误，返回False
             return False
-        return True
-    except (ValueError, TypeError):
-        # 转换失败或类型错误，返回False
-        return False
+    # 验证经纬度范围
+    # 经度范围：-180（西经180度）到180（东经180度）
+    # 纬度范围：-90（南纬90度）到90（北纬90度）
+    return -180.0 <= lon <= 180.0 and -90.0 <= lat <= 90.0
 
 def build_query_filters(request_args: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -216,28 +189,48 @@ def build_query_filters(request_args: Dict[str, Any]) -> Dict[str, Any]:
         >>> #     }
         >>> # }
     """
-    filters = {}
+    # 只取参与构建过滤器的参数作为缓存键（page、per_page等分页参数不影响过滤器）
+    key = tuple(request_args.get(field) for field in QUERY_FILTER_FIELDS)
+    # 不带任何筛选条件的请求（如首页默认列表）直接返回空过滤器
+    if all(value is None for value in key):
+        return {}
+    filters = _build_query_filters_cached(key)
+    # 缓存的过滤器在请求之间共享，返回副本，调用方修改返回值时不影响缓存
+    return {field: dict(value) if isinstance(value, dict) else value
+            for field, value in filters.items()}
+
+# 精确匹配的查询参数（参数名与文档字段名相同）
+EXACT_FILTER_FIELDS = ('device_id', 'type', 'status', 'log_type')
+# 参与构建查询过滤器的请求参数（精确匹配字段在前，时间范围在后）
+QUERY_FILTER_FIELDS = EXACT_FILTER_FIELDS + ('start_time', 'end_time')
+
+@lru_cache(maxsize=1024)
+def _build_query_filters_cached(key: tuple) -> Dict[str, Any]:
+    """
+    根据参数值元组构建查询过滤器（结果按参数值缓存）
     
-    # 设备ID过滤（精确匹配）
-    if 'device_id' in request_args:
-        filters['device_id'] = request_args['device_id']
+    翻页时筛选条件不变，相同的筛选条件只需构建一次。
     
-    # 设备类型过滤（精确匹配）
-    if 'type' in request_args:
-        filters['type'] = request_args['type']
+    Args:
+        key: 按QUERY_FILTER_FIELDS顺序排列的参数值元组（未提供的参数为None）
     
-    # 状态过滤（精确匹配）
-    if 'status' in request_args:
-        filters['status'] = request_args['status']
+    Returns:
+        Dict[str, Any]: MongoDB查询过滤器字典（调用方不应修改）
+    """
+    # 精确匹配的字段（device_id/type/status/log_type）直接按字段名放入过滤器
+    filters = {field: value
+               for field, value in zip(EXACT_FILTER_FIELDS, key)
+               if value is not None}
+    start_time, end_time = key[len(EXACT_FILTER_FIELDS):]
     
-    # 日志类型过滤（精确匹配）
-    if 'log_type' in request_args:
-        filters['log_type'] = request_args['log_type']
+    # 未提供时间范围时无需解析时间
+    if start_time is None and end_time is None:
+        return filters
     
     # 时间范围过滤（使用MongoDB范围查询操作符）
     # 解析开始时间和结束时间
-    start_time = parse_datetime(request_args.get('start_time'))
-    end_time = parse_datetime(request_args.get('end_time'))
+    start_time = parse_datetime(start_time)
+    end_time = parse_datetime(end_time)
     
     # 如果提供了开始时间或结束时间，构建时间范围过滤器
     if start_time or end_time:
@@ -252,3 +245,74 @@ def build_query_filters(request_args: Dict[str, Any]) -> Dict[str, Any]:
     
     return filters
 
+
+def build_projection(fields: Optional[str],
+                     default: Optional[Dict[str, int]] = None) -> Optional[Dict[str, int]]:
+    """
+    根据请求参数构建MongoDB投影（projection）
+    
+    列表类接口默认只返回前端展示所需的字段，避免把config等较大的内嵌文档
+    从mongod传输到Python再编码为JSON，减少网络传输量和BSON解码时间。
+    调用方也可以通过fields参数（逗号分隔）显式指定需要的字段。
+    
+    Args:
+        fields: 逗号分隔的字段列表字符串（如：'device_id,name,status'），可以为None或空字符串
+        default: 未指定fields时使用的默认投影（None表示返回完整文档）
+    
+    Returns:
+        Optional[Dict[str, int]]: MongoDB投影字典，None表示返回完整文档
+    
+    示例:
+        >>> build_projection('device_id, name')
+        {'device_id': 1, 'name': 1}
+        
+        >>> build_projection(None, {'device_id': 1})
+        {'device_id': 1}
+    """
+    if not fields:
+        return default
+    # 去除空白并忽略空字段名（如：'a,,b'）
+    projection = {field.strip(): 1 for field in fields.split(',') if field.strip()}
+    return projection or default
+
+def stream_json_response(cursor: Iterable[Dict[str, Any]], **extra: Any) -> Response:
+    """
+    以流式JSON响应返回查询游标中的文档
+    
+    与list(cursor)后再jsonify相比，文档从游标取出后立即编码并发送，
+    内存占用与结果集大小无关，客户端也能更早收到第一个字节。
+    响应格式与普通列表接口一致：
+        {"success": true, "data": [...], "count": 文档数量, ...extra}
+    
+    调用前会先从游标取出第一个文档，这样查询条件错误、连接失败等异常
+    仍会在视图函数的try块中抛出，而不是在已经发送200状态码之后才出现。
+    
+    Args:
+        cursor: MongoDB查询游标（或任意可迭代的文档序列）
+        **extra: 附加到响应中的其他字段（如分页信息）
+    
+    Returns:
+        Response: application/json流式响应
+    
+    示例:
+        >>> cursor = devices_collection.find(query).batch_size(500)
+        >>> return stream_json_response(cursor)
+    """
+    iterator = iter(cursor)
+    first = next(iterator, None)
+    dumps = current_app.json.dumps
+    
+    def generate():
+        yield '{"success":true,"data":['
+        count = 0
+        if first is not None:
+            yield dumps(first, separators=(',', ':'))
+            count = 1
+            for doc in iterator:
+                yield ',' + dumps(doc, separators=(',', ':'))
+                count += 1
+        # 文档数量在遍历结束后才能确定，因此放在data之后输出
+        tail = dict(extra, count=count)
+        yield '],' + dumps(tail, separators=(',', ':'))[1:]
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
@@ -256,7 +256,7 @@ function deleteDevice(deviceId) {
 /**
  * 查询附近设备（地理位置查询）
  * 
- * 使用MongoDB的$near操作符查询指定位置附近的设备。
+ * 使用MongoDB的$geoNear聚合阶段查询指定位置附近的设备。
  * 这是MongoDB文档数据库的特色功能，利用2dsphere索引实现高效的地理位置查询。
  * 
  * 功能：
@@ -283,7 +283,7 @@ function searchNearbyDevices() {
     }
     
     // 构建API请求URL
-    // 使用MongoDB的$near查询，需要提供中心点坐标和最大距离
+    // 使用MongoDB的$geoNear查询，需要提供中心点坐标和最大距离
     const url = `${API_BASE}/nearby?longitude=${longitude}&latitude=${latitude}&max_distance=${maxDistance}`;
     
     // 发送GET请求
@@ -18,6 +18,8 @@ const API_BASE = '/api/logs';
 
 // ==================== 全局变量 ====================
 let currentPage = 1;  // 当前页码
+let nextCursor = null;  // 下一页游标（后端返回的pagination.next_cursor）
+let cursorFilterQuery = null;  // 获取nextCursor时使用的筛选条件
 let typeChart = null;  // 日志类型统计图表对象（Chart.js）
 let hourlyChart = null;  // 按小时统计图表对象（Chart.js）
 
@@ -30,6 +32,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // 加载日志列表
 function loadLogs(page = 1) {
+    const previousPage = currentPage;
     currentPage = page;
     const deviceId = document.getElementById('logDeviceId').value;
     const logType = document.getElementById('logType').value;
@@ -54,16 +57,25 @@ function loadLogs(page = 1) {
         endTime = endTime.replace('T', ' ');
     }
     
-    let url = `${API_BASE}?page=${page}&per_page=50`;
-    if (deviceId) url += `&device_id=${encodeURIComponent(deviceId)}`;
-    if (logType) url += `&log_type=${encodeURIComponent(logType)}`;
-    if (startTime) url += `&start_time=${encodeURIComponent(startTime)}`;
-    if (endTime) url += `&end_time=${encodeURIComponent(endTime)}`;
+    let filterQuery = '';
+    if (deviceId) filterQuery += `&device_id=${encodeURIComponent(deviceId)}`;
+    if (logType) filterQuery += `&log_type=${encodeURIComponent(logType)}`;
+    if (startTime) filterQuery += `&start_time=${encodeURIComponent(startTime)}`;
+    if (endTime) filterQuery += `&end_time=${encodeURIComponent(endTime)}`;
+    
+    let url = `${API_BASE}?page=${page}&per_page=50${filterQuery}`;
+    // 筛选条件不变、顺序翻到下一页时使用游标分页
+    // 后端从上一页最后一条日志之后继续读取，不需要跳过前面所有页的日志
+    if (page === previousPage + 1 && nextCursor && cursorFilterQuery === filterQuery) {
+        url += `&before=${encodeURIComponent(nextCursor.before)}&before_id=${nextCursor.before_id}`;
+    }
     
     fetch(url)
         .then(response => response.json())
         .then(data => {
             if (data.success) {
+                nextCursor = data.pagination.next_cursor;
+                cursorFilterQuery = filterQuery;
                 displayLogs(data.data);
                 displayPagination(data.pagination);
             } else {
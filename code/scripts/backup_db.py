@@ -6,14 +6,18 @@ MongoDB数据库备份脚本
 1. 创建数据库备份（使用mongodump）
 2. 列出所有备份
 3. 恢复数据库备份（使用mongorestore）
+4. 复制数据库（mongodump通过管道直接导入mongorestore，不写中间文件）
 
 备份文件存储位置：data/backup/
-备份文件命名格式：smart_home_backup_YYYYMMDD_HHMMSS
+备份文件命名格式：smart_home_backup_YYYYMMDD_HHMMSS.archive.gz
+（mongodump --archive --gzip 输出的单个压缩归档文件；
+  旧版本生成的同名备份目录仍可列出和恢复）
 
 使用方法：
     python backup_db.py backup                    # 创建备份
     python backup_db.py list                      # 列出所有备份
     python backup_db.py restore <备份名称>        # 恢复备份
+    python backup_db.py clone <目标数据库>        # 复制数据库
 
 前置要求：
     - 已安装MongoDB工具（mongodump和mongorestore）
@@ -38,16 +42,67 @@ MONGO_DATABASE = os.getenv('MONGO_DATABASE', 'smart_home')
 # ==================== 备份目录配置 ====================
 # 备份文件存储目录：项目根目录/data/backup/
 BACKUP_DIR = Path(__file__).parent.parent.parent / 'data' / 'backup'
+# 备份归档文件的后缀（备份名称 + 后缀 = 文件名）
+BACKUP_SUFFIX = '.archive.gz'
+# 备份/恢复的并行度：同时导出/导入的集合数，恢复时也是每个集合的并行插入线程数
+# 日志集合远大于其他集合，恢复时主要靠集合内的并行插入提速
+# 默认取CPU核心数，最多4个（超过CPU核心数的线程只会互相争抢CPU）
+BACKUP_PARALLELISM = int(os.getenv('BACKUP_PARALLELISM', min(os.cpu_count() or 1, 4)))
+
+
+def _dir_size(path):
+    """
+    计算目录下所有文件的总大小（字节）
+    
+    使用os.scandir逐层遍历，DirEntry在遍历目录时已带有文件类型信息，
+    每个文件只需调用一次stat，也不必为每个条目创建Path对象。
+    
+    @param path: 目录路径
+    @return: 文件总大小（字节）
+    """
+    total_size = 0
+    stack = [str(path)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    total_size += entry.stat(follow_symlinks=False).st_size
+    return total_size
+
+
+def _run_tool(cmd):
+    """
+    运行MongoDB命令行工具，并逐行输出其进度信息
+    
+    mongodump/mongorestore的进度和错误信息写到标准错误。
+    这里逐行读取并立即打印，而不是等命令结束后一次性取回全部输出，
+    备份时间再长，脚本占用的内存也不会随输出增加，出错原因也已显示在终端上。
+    
+    @param cmd: 命令及参数列表
+    @raise subprocess.CalledProcessError: 命令返回非零退出码
+    @raise FileNotFoundError: 未找到命令
+    """
+    with subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True) as process:
+        for line in process.stderr:
+            print(line, end='')
+    if process.returncode != 0:
+        # 只记录工具名称，命令参数中包含数据库密码，不应出现在错误信息中
+        raise subprocess.CalledProcessError(process.returncode, cmd[0])
 
 
 def create_backup():
     """
     创建数据库备份
     
-    使用mongodump工具导出MongoDB数据库到指定目录。
+    使用mongodump工具将MongoDB数据库导出为单个gzip压缩归档文件。
     备份文件包含数据库的所有集合和索引信息。
     
-    @return: 备份路径（Path对象），如果失败返回None
+    与按集合输出BSON文件的目录相比，归档在导出时直接压缩并顺序写入一个文件，
+    写盘量更小，备份大小也只需读取一次文件大小。
+    
+    @return: 备份文件路径（Path对象），如果失败返回None
     """
     # 创建备份目录（如果不存在）
     BACKUP_DIR.mkdir(parents=True, exist_ok=True)
@@ -56,7 +111,7 @@ def create_backup():
     # 格式：smart_home_backup_YYYYMMDD_HHMMSS
     timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
     backup_name = f'smart_home_backup_{timestamp}'
-    backup_path = BACKUP_DIR / backup_name
+    backup_path = BACKUP_DIR / f'{backup_name}{BACKUP_SUFFIX}'
     
     print('=' * 50)
     print('MongoDB 数据库备份脚本')
@@ -72,7 +127,9 @@ def create_backup():
         'mongodump',
         '--host', f'{MONGO_HOST}:{MONGO_PORT}',  # MongoDB主机和端口
         '--db', MONGO_DATABASE,  # 要备份的数据库名称
-        '--out', str(backup_path)  # 备份输出目录
+        f'--archive={backup_path}',  # 输出为单个归档文件
+        '--gzip',  # 导出时压缩
+        f'--numParallelCollections={BACKUP_PARALLELISM}'  # 并行导出的集合数
     ]
     
     # 如果使用认证，添加用户名和密码
@@ -84,35 +141,24 @@ def create_backup():
         ])
     
     try:
-        print('开始备份...')
-        # 执行mongodump命令
-        # capture_output=True: 捕获标准输出和错误输出
-        # text=True: 以文本模式返回输出
-        # check=True: 如果命令返回非零退出码，抛出CalledProcessError异常
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        print(f'开始备份（并行度: {BACKUP_PARALLELISM}）...')
+        # 执行mongodump命令（进度信息实时输出）
+        _run_tool(cmd)
         
         print('备份成功！')
         print(f'备份文件保存在: {backup_path}')
         
-        # 计算并显示备份文件大小
-        total_size = 0
-        for file_path in backup_path.rglob('*'):  # 递归遍历所有文件
-            if file_path.is_file():
-                total_size += file_path.stat().st_size
+        # 显示备份文件大小
+        total_size = backup_path.stat().st_size
         
         print(f'备份总大小: {total_size / 1024 / 1024:.2f} MB')
         
         return backup_path
         
     except subprocess.CalledProcessError as e:
-        # mongodump命令执行失败
+        # mongodump命令执行失败，删除不完整的归档文件，避免被当作有效备份列出和恢复
+        backup_path.unlink(missing_ok=True)
         print(f'备份失败: {e}')
-        print(f'错误输出: {e.stderr}')
         return None
     except FileNotFoundError:
         # 未找到mongodump命令
@@ -122,12 +168,20 @@ def create_backup():
 
 
 def list_backups():
-    """列出所有备份"""
+    """列出所有备份（归档文件和旧版本的备份目录）"""
     if not BACKUP_DIR.exists():
         print('备份目录不存在')
         return
     
-    backups = [d for d in BACKUP_DIR.iterdir() if d.is_dir()]
+    # 每个备份记录为 (备份名称, 大小, 修改时间)，每个条目只stat一次
+    backups = []
+    with os.scandir(BACKUP_DIR) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(BACKUP_SUFFIX):
+                stat = entry.stat()
+                backups.append((entry.name[:-len(BACKUP_SUFFIX)], stat.st_size, stat.st_mtime))
+            elif entry.is_dir():
+                backups.append((entry.name, _dir_size(entry.path), entry.stat().st_mtime))
     
     if not backups:
         print('没有找到备份文件')
@@ -137,12 +191,11 @@ def list_backups():
     print('现有备份列表:')
     print('=' * 50)
     
-    backups.sort(key=lambda x: x.stat().st_mtime, reverse=True)
+    backups.sort(key=lambda backup: backup[2], reverse=True)
     
-    for backup in backups:
-        size = sum(f.stat().st_size for f in backup.rglob('*') if f.is_file())
-        mtime = datetime.datetime.fromtimestamp(backup.stat().st_mtime)
-        print(f'{backup.name}')
+    for name, size, mtime in backups:
+        mtime = datetime.datetime.fromtimestamp(mtime)
+        print(f'{name}')
         print(f'  大小: {size / 1024 / 1024:.2f} MB')
         print(f'  时间: {mtime.strftime("%Y-%m-%d %H:%M:%S")}')
         print()
@@ -155,10 +208,14 @@ def restore_backup(backup_name):
     使用mongorestore工具从备份文件恢复MongoDB数据库。
     警告：此操作会删除现有数据库中的所有数据！
     
-    @param backup_name: 备份目录名称（如：smart_home_backup_20240101_120000）
+    @param backup_name: 备份名称（如：smart_home_backup_20240101_120000）
     @return: 恢复成功返回True，失败返回False
     """
-    backup_path = BACKUP_DIR / backup_name
+    # 优先使用归档文件，找不到时使用旧版本的备份目录
+    if backup_name.endswith(BACKUP_SUFFIX):
+        backup_name = backup_name[:-len(BACKUP_SUFFIX)]
+    archive_path = BACKUP_DIR / f'{backup_name}{BACKUP_SUFFIX}'
+    backup_path = archive_path if archive_path.is_file() else BACKUP_DIR / backup_name
     
     # 检查备份文件是否存在
     if not backup_path.exists():
@@ -185,11 +242,22 @@ def restore_backup(backup_name):
     cmd = [
         'mongorestore',
         '--host', f'{MONGO_HOST}:{MONGO_PORT}',  # MongoDB主机和端口
-        '--db', MONGO_DATABASE,  # 目标数据库名称
         '--drop',  # 删除现有数据（重要：会清空目标数据库）
-        str(backup_path / MONGO_DATABASE)  # 备份文件路径
-        # mongodump导出的目录结构：backup_path/database_name/
+        f'--numParallelCollections={BACKUP_PARALLELISM}',  # 并行恢复的集合数
+        f'--numInsertionWorkersPerCollection={BACKUP_PARALLELISM}'  # 每个集合的并行插入线程数
     ]
+    if backup_path == archive_path:
+        cmd.extend([
+            f'--archive={backup_path}',  # 从归档文件读取
+            '--gzip',  # 归档在备份时已压缩
+            '--nsInclude', f'{MONGO_DATABASE}.*'  # 只恢复本数据库的集合
+        ])
+    else:
+        cmd.extend([
+            '--db', MONGO_DATABASE,  # 目标数据库名称
+            str(backup_path / MONGO_DATABASE)  # 备份文件路径
+            # mongodump导出的目录结构：backup_path/database_name/
+        ])
     
     # 如果使用认证，添加用户名和密码
     if MONGO_USERNAME and MONGO_PASSWORD:
@@ -200,14 +268,9 @@ def restore_backup(backup_name):
         ])
     
     try:
-        print('开始恢复...')
-        # 执行mongorestore命令
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
+        print(f'开始恢复（并行度: {BACKUP_PARALLELISM}）...')
+        # 执行mongorestore命令（进度信息实时输出）
+        _run_tool(cmd)
         
         print('恢复成功！')
         return True
@@ -215,7 +278,6 @@ def restore_backup(backup_name):
     except subprocess.CalledProcessError as e:
         # mongorestore命令执行失败
         print(f'恢复失败: {e}')
-        print(f'错误输出: {e.stderr}')
         return False
     except FileNotFoundError:
         # 未找到mongorestore命令
@@ -224,6 +286,87 @@ def restore_backup(backup_name):
         return False
 
 
+def clone_database(target_database):
+    """
+    将当前数据库复制到同一MongoDB服务器上的另一个数据库
+    
+    mongodump的归档输出通过管道直接交给mongorestore导入，
+    数据不经过磁盘上的中间文件；管道在本机内传输，也无需压缩。
+    警告：此操作会删除目标数据库中同名集合的现有数据！
+    
+    @param target_database: 目标数据库名称（不能与当前数据库相同）
+    @return: 复制成功返回True，失败返回False
+    """
+    if target_database == MONGO_DATABASE:
+        print('错误: 目标数据库不能与当前数据库相同')
+        return False
+    
+    print('=' * 50)
+    print('复制数据库')
+    print('=' * 50)
+    print(f'源数据库: {MONGO_DATABASE}')
+    print(f'目标数据库: {target_database}')
+    print('=' * 50)
+    
+    # 复制操作会覆盖目标数据库，需要用户确认
+    print('警告: 此操作将覆盖目标数据库中的同名集合！')
+    confirm = input('确认复制？(yes/no): ').strip().lower()
+    if confirm != 'yes':
+        print('操作已取消')
+        return False
+    
+    # --archive不指定文件时，mongodump写到标准输出，mongorestore从标准输入读取
+    dump_cmd = [
+        'mongodump',
+        '--host', f'{MONGO_HOST}:{MONGO_PORT}',
+        '--db', MONGO_DATABASE,
+        '--archive',
+        f'--numParallelCollections={BACKUP_PARALLELISM}'
+    ]
+    restore_cmd = [
+        'mongorestore',
+        '--host', f'{MONGO_HOST}:{MONGO_PORT}',
+        '--archive',
+        '--drop',
+        '--nsFrom', f'{MONGO_DATABASE}.*',  # 将源数据库的集合
+        '--nsTo', f'{target_database}.*',  # 导入到目标数据库
+        f'--numParallelCollections={BACKUP_PARALLELISM}',
+        f'--numInsertionWorkersPerCollection={BACKUP_PARALLELISM}'
+    ]
+    
+    # 如果使用认证，添加用户名和密码
+    if MONGO_USERNAME and MONGO_PASSWORD:
+        for cmd in (dump_cmd, restore_cmd):
+            cmd.extend([
+                '--username', MONGO_USERNAME,
+                '--password', MONGO_PASSWORD,
+                '--authenticationDatabase', 'admin'
+            ])
+    
+    try:
+        print(f'开始复制（并行度: {BACKUP_PARALLELISM}）...')
+        # 两个工具的进度信息直接输出到终端
+        with subprocess.Popen(dump_cmd, stdout=subprocess.PIPE) as dump:
+            with subprocess.Popen(restore_cmd, stdin=dump.stdout,
+                                  stdout=subprocess.DEVNULL) as restore:
+                # 父进程关闭自己持有的管道读端，mongorestore提前退出时mongodump能收到SIGPIPE
+                dump.stdout.close()
+        
+        if dump.returncode != 0 or restore.returncode != 0:
+            print(f'复制失败: mongodump退出码 {dump.returncode}, '
+                  f'mongorestore退出码 {restore.returncode}')
+            return False
+        
+        print('复制成功！')
+        return True
+        
+    except FileNotFoundError:
+        # 未找到mongodump或mongorestore命令
+        print('错误: 未找到mongodump或mongorestore命令')
+        print('请确保MongoDB工具已安装并在PATH中')
+        return False
+
+
 def main():
     """主函数"""
     if len(sys.argv) < 2:
@@ -231,6 +374,7 @@ def main():
         print('  python backup_db.py backup      - 创建备份')
         print('  python backup_db.py list        - 列出所有备份')
         print('  python backup_db.py restore <备份名称>  - 恢复备份')
+        print('  python backup_db.py clone <目标数据库>  - 复制数据库')
         sys.exit(1)
     
     command = sys.argv[1].lower()
@@ -244,6 +388,11 @@ def main():
             print('错误: 请指定备份名称')
             sys.exit(1)
         restore_backup(sys.argv[2])
+    elif command == 'clone':
+        if len(sys.argv) < 3:
+            print('错误: 请指定目标数据库名称')
+            sys.exit(1)
+        clone_database(sys.argv[2])
     else:
         print(f'错误: 未知命令: {command}')
         sys.exit(1)
@@ -21,8 +21,11 @@
 
 import json
 import random
+from collections import Counter
+from itertools import chain, islice
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
-from pymongo import MongoClient
+from pymongo import MongoClient, WriteConcern
 import os
 import sys
 
@@ -41,6 +44,18 @@ if MONGO_USERNAME and MONGO_PASSWORD:
 else:
     MONGO_URI = f"mongodb://{MONGO_HOST}:{MONGO_PORT}/{MONGO_DATABASE}"
 
+# 导入脚本创建MongoClient时使用的连接选项（主进程和各工作进程相同）
+# compressors: 网络传输压缩，日志消息模板和字段名大量重复，压缩后批量写入的数据量明显减少
+#              （zstd需要安装zstandard，服务端不支持时退回zlib）
+# zlibCompressionLevel: zlib使用最快的压缩级别，避免压缩本身成为导入瓶颈
+# maxPoolSize: 导入脚本每个进程只有一个线程写入，一个连接即可
+MONGO_CLIENT_OPTIONS = {
+    'serverSelectionTimeoutMS': 5000,
+    'compressors': 'zstd,zlib',
+    'zlibCompressionLevel': 1,
+    'maxPoolSize': 1
+}
+
 # ==================== 数据生成配置 ====================
 # 设备类型列表（7种智能家居设备类型）
 DEVICE_TYPES = [
@@ -65,8 +80,56 @@ LOG_TYPES = ['info', 'warning', 'error', 'status_change']
 GUANGZHOU_LAT_RANGE = (23.0, 23.3)
 GUANGZHOU_LON_RANGE = (113.2, 113.5)
 
+# ==================== 设备配置生成 ====================
+# 各设备类型配置中的固定部分（生成配置时浅拷贝，嵌套的范围字典只读共享）
+SENSOR_CONFIG_TEMPLATE = {
+    'temperature_range': {'min': -10, 'max': 50},
+    'humidity_range': {'min': 0, 'max': 100}
+}
+CAMERA_CONFIG_TEMPLATE = {'motion_detection': True}
+LOCK_CONFIG_TEMPLATE = {'auto_lock': True}
+SOCKET_CONFIG_TEMPLATE = {'energy_monitoring': True, 'scheduling': False}
+
+# 设备类型 -> 配置生成函数（参数为当前时间），按类型直接查表，无需逐个比较类型名称
+# 候选值使用元组字面量：元组是编译期常量，每次调用不会重新创建列表
+DEVICE_CONFIG_BUILDERS = {
+    '智能灯': lambda now: {
+        'brightness': random.randint(10, 100),
+        'color': random.choice(('white', 'warm', 'cool', 'rgb')),
+        'power_consumption': round(random.uniform(5.0, 15.0), 2)
+    },
+    '温湿度传感器': lambda now: {
+        **SENSOR_CONFIG_TEMPLATE,
+        'update_interval': random.choice((30, 60, 120))  # 秒
+    },
+    '摄像头': lambda now: {
+        'resolution': random.choice(('720p', '1080p', '4K')),
+        'night_vision': random.choice((True, False)),
+        **CAMERA_CONFIG_TEMPLATE
+    },
+    '智能门锁': lambda now: {
+        'lock_type': random.choice(('fingerprint', 'password', 'card', 'bluetooth')),
+        'battery_level': random.randint(20, 100),
+        **LOCK_CONFIG_TEMPLATE
+    },
+    '烟雾报警器': lambda now: {
+        'sensitivity': random.choice(('low', 'medium', 'high')),
+        'battery_level': random.randint(50, 100),
+        'test_date': (now - timedelta(days=random.randint(0, 30))).isoformat()
+    },
+    '智能插座': lambda now: {
+        'max_power': random.choice((2000, 3000, 4000)),  # 瓦
+        **SOCKET_CONFIG_TEMPLATE
+    },
+    '运动传感器': lambda now: {
+        'detection_range': random.choice((5, 10, 15)),  # 米
+        'sensitivity': random.choice(('low', 'medium', 'high')),
+        'battery_level': random.randint(30, 100)
+    }
+}
 
-def generate_device(device_id, device_type):
+
+def generate_device(device_id, device_type, now=None):
     """
     生成单个设备数据
     
@@ -75,8 +138,12 @@ def generate_device(device_id, device_type):
     
     @param device_id: 设备ID（字符串，如：DEV0001）
     @param device_type: 设备类型（字符串）
+    @param now: 当前时间（可选，批量生成时由调用方获取一次后传入）
     @return: 设备文档字典，符合MongoDB文档格式
     """
+    if now is None:
+        now = datetime.now()
+    
     # 生成随机位置（广州市范围内）
     # 使用均匀分布随机生成经纬度，模拟设备在广州市内的分布
     latitude = random.uniform(*GUANGZHOU_LAT_RANGE)
@@ -84,52 +151,10 @@ def generate_device(device_id, device_type):
     
     # 根据设备类型生成配置（内嵌文档）
     # 不同设备类型有不同的配置项，展示MongoDB文档数据库的灵活性
-    config = {}
-    if device_type == '智能灯':
-        config = {
-            'brightness': random.randint(10, 100),
-            'color': random.choice(['white', 'warm', 'cool', 'rgb']),
-            'power_consumption': round(random.uniform(5.0, 15.0), 2)
-        }
-    elif device_type == '温湿度传感器':
-        config = {
-            'temperature_range': {'min': -10, 'max': 50},
-            'humidity_range': {'min': 0, 'max': 100},
-            'update_interval': random.choice([30, 60, 120])  # 秒
-        }
-    elif device_type == '摄像头':
-        config = {
-            'resolution': random.choice(['720p', '1080p', '4K']),
-            'night_vision': random.choice([True, False]),
-            'motion_detection': True
-        }
-    elif device_type == '智能门锁':
-        config = {
-            'lock_type': random.choice(['fingerprint', 'password', 'card', 'bluetooth']),
-            'battery_level': random.randint(20, 100),
-            'auto_lock': True
-        }
-    elif device_type == '烟雾报警器':
-        config = {
-            'sensitivity': random.choice(['low', 'medium', 'high']),
-            'battery_level': random.randint(50, 100),
-            'test_date': (datetime.now() - timedelta(days=random.randint(0, 30))).isoformat()
-        }
-    elif device_type == '智能插座':
-        config = {
-            'max_power': random.choice([2000, 3000, 4000]),  # 瓦
-            'energy_monitoring': True,
-            'scheduling': False
-        }
-    elif device_type == '运动传感器':
-        config = {
-            'detection_range': random.choice([5, 10, 15]),  # 米
-            'sensitivity': random.choice(['low', 'medium', 'high']),
-            'battery_level': random.randint(30, 100)
-        }
+    config = DEVICE_CONFIG_BUILDERS[device_type](now)
     
     # 生成创建时间（最近30天内）
-    created_at = datetime.now() - timedelta(days=random.randint(0, 30))
+    created_at = now - timedelta(days=random.randint(0, 30))
     
     return {
         'device_id': device_id,
@@ -146,90 +171,112 @@ def generate_device(device_id, device_type):
     }
 
 
-def generate_log(device_id, log_type=None):
+# 各日志类型的消息模板
+LOG_MESSAGES = {
+    'info': [
+        '设备正常运行',
+        '数据采集完成',
+        '定时任务执行成功',
+        '配置更新完成',
+        '设备自检通过'
+    ],
+    'warning': [
+        '电池电量低于30%',
+        '网络连接不稳定',
+        '传感器数据异常',
+        '存储空间不足',
+        '温度超出正常范围'
+    ],
+    'error': [
+        '设备连接失败',
+        '传感器读取错误',
+        '网络超时',
+        '配置加载失败',
+        '系统错误'
+    ],
+    'status_change': [
+        '设备状态变更',
+        '设备上线',
+        '设备离线',
+        '进入维护模式',
+        '恢复正常运行'
+    ]
+}
+
+# 日志时间戳的随机范围：最近30天内（0-30天前，精确到分钟）
+LOG_TIME_RANGE_MINUTES = 31 * 24 * 60
+
+# 每批插入10000条日志：日志文档很小（约200字节），一批仍远小于单条消息48MB的上限，
+# 约12,000条日志只需两次网络往返
+LOG_BATCH_SIZE = 10000
+
+
+def generate_log_details(log_type):
     """
-    生成单个日志数据
+    根据日志类型生成日志详情（内嵌文档）
     
-    根据日志类型生成不同的消息和详情，展示MongoDB内嵌文档的使用。
-    日志内容使用内嵌文档存储，支持全文搜索。
+    不同日志类型有不同的详情结构
     
-    @param device_id: 设备ID（字符串）
-    @param log_type: 日志类型（可选，如果为None则随机选择）
-    @return: 日志文档字典，符合MongoDB文档格式
+    @param log_type: 日志类型
+    @return: 日志详情字典
     """
-    # 如果未指定日志类型，随机选择一种
-    if log_type is None:
-        log_type = random.choice(LOG_TYPES)
-    
-    # 生成时间戳（最近30天内）
-    # 模拟设备在过去30天内产生的日志
-    timestamp = datetime.now() - timedelta(
-        days=random.randint(0, 30),  # 随机天数（0-30天前）
-        hours=random.randint(0, 23),  # 随机小时（0-23）
-        minutes=random.randint(0, 59)  # 随机分钟（0-59）
-    )
-    
-    # 根据日志类型生成消息和详情（内嵌文档）
-    # 不同日志类型有不同的消息模板和详情结构
     if log_type == 'info':
-        messages = [
-            '设备正常运行',
-            '数据采集完成',
-            '定时任务执行成功',
-            '配置更新完成',
-            '设备自检通过'
-        ]
-        details = {
+        return {
             'cpu_usage': round(random.uniform(10, 50), 2),
             'memory_usage': round(random.uniform(20, 60), 2)
         }
     elif log_type == 'warning':
-        messages = [
-            '电池电量低于30%',
-            '网络连接不稳定',
-            '传感器数据异常',
-            '存储空间不足',
-            '温度超出正常范围'
-        ]
-        details = {
-            'warning_level': random.choice(['low', 'medium']),
+        return {
+            'warning_level': random.choice(('low', 'medium')),
             'value': round(random.uniform(0, 100), 2)
         }
     elif log_type == 'error':
-        messages = [
-            '设备连接失败',
-            '传感器读取错误',
-            '网络超时',
-            '配置加载失败',
-            '系统错误'
-        ]
-        details = {
+        return {
             'error_code': random.randint(1000, 9999),
             'error_message': '系统内部错误'
         }
     else:  # status_change
-        messages = [
-            '设备状态变更',
-            '设备上线',
-            '设备离线',
-            '进入维护模式',
-            '恢复正常运行'
-        ]
-        details = {
-            'old_status': random.choice(DEVICE_STATUSES),
-            'new_status': random.choice(DEVICE_STATUSES),
-            'reason': random.choice(['manual', 'automatic', 'scheduled'])
+        # 新旧状态一次抽取
+        old_status, new_status = random.choices(DEVICE_STATUSES, k=2)
+        return {
+            'old_status': old_status,
+            'new_status': new_status,
+            'reason': random.choice(('manual', 'automatic', 'scheduled'))
         }
+
+
+def generate_logs(device_id, count, now=None):
+    """
+    批量生成同一设备的多条日志
     
-    return {
-        'device_id': device_id,
-        'log_type': log_type,
-        'timestamp': timestamp,
-        'content': {
-            'message': random.choice(messages),
-            'details': details
+    根据日志类型生成不同的消息和详情，展示MongoDB内嵌文档的使用。
+    日志内容使用内嵌文档存储，支持全文搜索。
+    日志类型和时间偏移各用一次random.choices批量抽样，当前时间也只获取一次，
+    减少大量日志生成时的函数调用开销。
+    
+    @param device_id: 设备ID（字符串）
+    @param count: 日志数量
+    @param now: 当前时间（可选，导入多个设备时由调用方获取一次后传入）
+    @return: 日志文档列表
+    """
+    if now is None:
+        now = datetime.now()
+    log_types = random.choices(LOG_TYPES, k=count)
+    # 时间戳在最近30天内随机分布，模拟设备在过去30天内产生的日志
+    offsets = random.choices(range(LOG_TIME_RANGE_MINUTES), k=count)
+    
+    return [
+        {
+            'device_id': device_id,
+            'log_type': log_type,
+            'timestamp': now - timedelta(minutes=offset),
+            'content': {
+                'message': random.choice(LOG_MESSAGES[log_type]),
+                'details': generate_log_details(log_type)
+            }
         }
-    }
+        for log_type, offset in zip(log_types, offsets)
+    ]
 
 
 def import_devices(client, num_devices=80):
@@ -241,22 +288,27 @@ def import_devices(client, num_devices=80):
     
     @param client: MongoDB客户端对象
     @param num_devices: 要生成的设备数量（默认：80）
-    @return: 设备ID列表，用于后续生成日志时关联设备
+    @return: (设备ID列表, 各设备类型的数量Counter)
+             设备ID用于后续生成日志时关联设备，类型数量用于显示统计信息
     """
     db = client[MONGO_DATABASE]
     devices_collection = db.devices
     
     print(f'开始生成 {num_devices} 个设备...')
     
+    # 全部设备共用一次获取的当前时间
+    now = datetime.now()
+    
+    # 一次性为全部设备随机选择设备类型
+    device_types = random.choices(DEVICE_TYPES, k=num_devices)
+    
     # 生成设备数据列表
     devices = []
-    for i in range(1, num_devices + 1):
+    for i, device_type in enumerate(device_types, start=1):
         # 生成设备ID（格式：DEV0001, DEV0002, ...）
-        device_id = f'DEV{str(i).zfill(4)}'
-        # 随机选择设备类型
-        device_type = random.choice(DEVICE_TYPES)
+        device_id = f'DEV{i:04d}'
         # 生成设备数据
-        device = generate_device(device_id, device_type)
+        device = generate_device(device_id, device_type, now)
         devices.append(device)
     
     # 批量插入设备数据
@@ -265,50 +317,157 @@ def import_devices(client, num_devices=80):
     print(f'成功导入 {len(result.inserted_ids)} 个设备')
     
     # 返回设备ID列表，用于后续生成日志时关联设备
-    return [d['device_id'] for d in devices]
+    # 设备类型在生成时已经确定，直接在内存中计数，无需再到数据库聚合统计
+    return [d['device_id'] for d in devices], Counter(device_types)
+
+
+def _insert_logs(logs_collection, device_ids, num_logs_per_device):
+    """
+    为一组设备生成日志并分批插入
+    
+    @param logs_collection: 日志集合对象
+    @param device_ids: 设备ID列表
+    @param num_logs_per_device: 每个设备生成的日志数量
+    @return: 插入的各类型日志数量（Counter）
+    """
+    inserted = 0
+    type_counts = Counter()
+    now = datetime.now()  # 全部日志的时间戳都相对同一时刻生成
+    
+    # 按设备依次惰性生成日志（每个设备的日志一次批量生成），
+    # 每次只从中取出一批，内存中最多只有一批日志和一个设备的日志
+    logs = chain.from_iterable(
+        generate_logs(device_id, num_logs_per_device, now) for device_id in device_ids
+    )
+    while True:
+        batch = list(islice(logs, LOG_BATCH_SIZE))
+        if not batch:
+            break
+        # ordered=False: 服务端无需按顺序逐条写入
+        logs_collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+        type_counts.update(log['log_type'] for log in batch)
+        print(f'已导入 {inserted} 条日志...')
+    
+    return type_counts
+
+
+def _get_logs_collection(client):
+    """获取导入日志使用的集合对象"""
+    # 导入的是可重新生成的示例数据，不等待写入日志落盘（j=False），缩短每批写入的等待时间
+    return client[MONGO_DATABASE].device_logs.with_options(
+        write_concern=WriteConcern(w=1, j=False)
+    )
 
 
-def import_logs(client, device_ids, num_logs_per_device=150):
+def _import_logs_worker(device_ids, num_logs_per_device):
+    """
+    工作进程：为分配到的设备生成并插入日志
+    
+    MongoClient不能跨进程共享，每个工作进程各自创建客户端。
+    
+    @return: 插入的各类型日志数量（Counter）
+    """
+    # 子进程继承了父进程的随机数状态，重新播种，避免各进程生成相同的日志
+    random.seed()
+    client = MongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
+    try:
+        return _insert_logs(_get_logs_collection(client), device_ids, num_logs_per_device)
+    finally:
+        client.close()
+
+
+def _drop_secondary_indexes(collection):
+    """
+    删除集合上除_id以外的全部索引，并返回它们的定义，供导入完成后重建
+    
+    @param collection: 集合对象
+    @return: 被删除的索引定义列表（list_indexes返回的格式）
+    """
+    specs = [spec for spec in collection.list_indexes() if spec['name'] != '_id_']
+    if specs:
+        collection.drop_indexes()
+    return specs
+
+
+def _restore_indexes(collection, specs):
+    """
+    按_drop_secondary_indexes返回的定义重建索引
+    
+    直接使用createIndexes命令提交原始定义，TTL、文本索引（权重、语言等）的选项原样保留。
+    
+    @param collection: 集合对象
+    @param specs: 索引定义列表
+    """
+    if not specs:
+        return
+    # v（索引版本）和ns（旧版本服务端返回的命名空间）由服务端生成，不能出现在创建请求中
+    indexes = [{key: value for key, value in spec.items() if key not in ('v', 'ns')}
+               for spec in specs]
+    collection.database.command('createIndexes', collection.name, indexes=indexes)
+
+
+def import_logs(client, device_ids, num_logs_per_device=150, workers=None):
     """
     导入日志数据
     
     为每个设备生成指定数量的日志，使用批量插入提高效率。
     由于日志数量较大（约12,000条），采用分批插入策略。
     
+    日志量超过一批时，按设备分片交给多个进程并行生成和插入，
+    进程数不超过CPU核心数和批次数（数据量小时不会启动多余的进程）。
+    
     @param client: MongoDB客户端对象
     @param device_ids: 设备ID列表
     @param num_logs_per_device: 每个设备生成的日志数量（默认：150）
+    @param workers: 并行进程数（默认：根据CPU核心数和日志量自动确定）
+    @return: 本次导入的各类型日志数量（Counter）
     """
-    db = client[MONGO_DATABASE]
-    logs_collection = db.device_logs
+    logs_collection = _get_logs_collection(client)
     
     total_logs = len(device_ids) * num_logs_per_device
     print(f'开始生成约 {total_logs} 条日志...')
     
-    logs = []
-    batch_size = 1000  # 每批插入1000条日志，避免内存占用过大
-    
-    # 为每个设备生成日志
-    for device_id in device_ids:
-        for _ in range(num_logs_per_device):
-            # 生成日志数据
-            log = generate_log(device_id)
-            logs.append(log)
-            
-            # 当累积到批次大小时，批量插入
-            if len(logs) >= batch_size:
-                logs_collection.insert_many(logs)
-                print(f'已导入 {len(logs)} 条日志...')
-                logs = []  # 清空列表，准备下一批
-    
-    # 插入剩余日志（不足一批的数据）
-    if logs:
-        logs_collection.insert_many(logs)
-        print(f'已导入剩余 {len(logs)} 条日志')
+    if workers is None:
+        batches = -(-total_logs // LOG_BATCH_SIZE)  # 向上取整
+        workers = min(os.cpu_count() or 1, batches, len(device_ids))
+    
+    # 日志集合为空时（首次导入或已清空），导入期间先删除二级索引，导入完成后一次性重建：
+    # 每条日志写入时不再逐个更新5~6个索引，建索引时也可以对全部数据排序后顺序构建
+    # 集合中已有数据时不删除，避免为少量新数据重建整个集合的索引
+    index_specs = []
+    if logs_collection.estimated_document_count() == 0:
+        index_specs = _drop_secondary_indexes(logs_collection)
+        if index_specs:
+            print(f'导入期间暂时删除 {len(index_specs)} 个索引...')
+    
+    type_counts = Counter()
+    try:
+        if workers <= 1:
+            type_counts = _insert_logs(logs_collection, device_ids, num_logs_per_device)
+        else:
+            # 按设备轮流分配，各进程的日志量基本相同
+            shards = [device_ids[i::workers] for i in range(workers)]
+            print(f'使用 {workers} 个进程并行导入...')
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_import_logs_worker, shard, num_logs_per_device)
+                           for shard in shards]
+                for future in as_completed(futures):
+                    worker_counts = future.result()
+                    type_counts.update(worker_counts)
+                    print(f'一个进程完成，导入 {sum(worker_counts.values())} 条日志')
+    finally:
+        # 导入失败时也要恢复索引
+        if index_specs:
+            print('正在重建索引...')
+            _restore_indexes(logs_collection, index_specs)
     
     # 统计最终日志总数
-    total_count = logs_collection.count_documents({})
+    # estimated_document_count读取集合元数据中的文档数，不扫描集合（统计全部文档时结果相同）
+    total_count = logs_collection.estimated_document_count()
     print(f'日志导入完成，共 {total_count} 条日志')
+    
+    return type_counts
 
 
 def main():
@@ -329,7 +488,7 @@ def main():
     try:
         # ==================== 连接MongoDB ====================
         print(f'正在连接MongoDB: {MONGO_HOST}:{MONGO_PORT}')
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        client = MongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
         # 测试连接
         client.admin.command('ping')
         print('MongoDB连接成功！')
@@ -358,36 +517,31 @@ def main():
         
         # ==================== 导入设备数据 ====================
         print('\n开始导入设备数据...')
-        device_ids = import_devices(client, num_devices=80)
+        device_ids, device_type_counts = import_devices(client, num_devices=80)
+        # 删除后端维护的设备统计文档和设备数据版本文档（导入脚本直接写数据库，不会更新它们）
+        # 后端下次查询时会重新生成，设备列表的ETag和响应缓存随之失效
+        db.device_stats.delete_many({'_id': {'$in': ['current', 'list_version']}})
         
         # ==================== 导入日志数据 ====================
         print('\n开始导入日志数据...')
-        import_logs(client, device_ids, num_logs_per_device=150)
+        log_type_counts = import_logs(client, device_ids, num_logs_per_device=150)
         
         # ==================== 显示统计信息 ====================
         print('\n' + '=' * 50)
         print('导入完成！统计信息：')
         print('=' * 50)
-        print(f'设备总数: {db.devices.count_documents({})}')
-        print(f'日志总数: {db.device_logs.count_documents({})}')
+        print(f'设备总数: {db.devices.estimated_document_count()}')
+        print(f'日志总数: {db.device_logs.estimated_document_count()}')
         
-        # 按类型统计设备（使用MongoDB聚合查询）
+        # 按类型统计本次导入的设备和日志
+        # 数量在生成数据时已经计数，不再对两个集合各执行一次全集合扫描的聚合查询
         print('\n设备类型统计:')
-        type_stats = db.devices.aggregate([
-            {'$group': {'_id': '$type', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}}
-        ])
-        for stat in type_stats:
-            print(f'  {stat["_id"]}: {stat["count"]} 个')
+        for device_type, count in device_type_counts.most_common():
+            print(f'  {device_type}: {count} 个')
         
-        # 按类型统计日志（使用MongoDB聚合查询）
         print('\n日志类型统计:')
-        log_stats = db.device_logs.aggregate([
-            {'$group': {'_id': '$log_type', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}}
-        ])
-        for stat in log_stats:
-            print(f'  {stat["_id"]}: {stat["count"]} 条')
+        for log_type, count in log_type_counts.most_common():
+            print(f'  {log_type}: {count} 条')
         
         print('\n数据导入完成！')
         
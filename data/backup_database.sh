@@ -104,6 +104,8 @@ if eval "${MONGODUMP_CMD}"; then
     echo "清理7天前的旧备份..."
     find "${BACKUP_DIR}" -name "smart_home_backup_*" -type d -mtime +7 -exec rm -rf {} + 2>/dev/null
     find "${BACKUP_DIR}" -name "smart_home_backup_*.tar.gz" -mtime +7 -delete 2>/dev/null
+    # backup_db.py生成的归档备份
+    find "${BACKUP_DIR}" -name "smart_home_backup_*.archive.gz" -mtime +7 -delete 2>/dev/null
     echo "✅ 已清理7天前的旧备份"
     
     exit 0
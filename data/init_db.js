@@ -23,10 +23,10 @@ db.createCollection('devices');
 db.createCollection('device_logs');
 
 // 为devices集合创建索引
-// 1. 地理位置索引（2dsphere）- 用于地理位置查询
+// 1. 地理位置索引（2dsphere）+ 设备状态 - 用于地理位置查询（可同时按状态筛选）
 db.devices.createIndex(
-  { location: '2dsphere' },
-  { name: 'location_2dsphere_idx' }
+  { location: '2dsphere', status: 1 },
+  { name: 'location_status_2dsphere_idx' }
 );
 
 // 2. 设备类型索引
@@ -47,6 +47,18 @@ db.devices.createIndex(
   { unique: true, name: 'device_id_unique_idx' }
 );
 
+// 5. 复合索引 - 设备类型 + 状态（优化设备列表的组合筛选）
+db.devices.createIndex(
+  { type: 1, status: 1 },
+  { name: 'type_status_idx' }
+);
+
+// 6. 设备名称索引（设备搜索时在索引键上匹配名称，避免集合扫描）
+db.devices.createIndex(
+  { name: 1 },
+  { name: 'name_idx' }
+);
+
 // 为device_logs集合创建索引
 // 1. TTL索引 - 自动删除90天前的日志
 db.device_logs.createIndex(
@@ -63,13 +75,25 @@ db.device_logs.createIndex(
   { name: 'device_timestamp_idx' }
 );
 
-// 3. 日志类型索引
+// 3. 复合索引 - 日志类型 + 时间戳（按日志类型筛选后按时间排序）
+db.device_logs.createIndex(
+  { log_type: 1, timestamp: -1, _id: -1 },
+  { name: 'log_type_timestamp_idx' }
+);
+
+// 4. 复合索引 - 设备ID + 日志类型 + 时间戳（按ESR规则，优化日志列表的筛选、排序和游标分页）
+db.device_logs.createIndex(
+  { device_id: 1, log_type: 1, timestamp: -1, _id: -1 },
+  { name: 'device_type_timestamp_idx' }
+);
+
+// 5. 复合索引 - 时间戳 + _id（优化无筛选条件时的日志列表排序和游标分页）
 db.device_logs.createIndex(
-  { log_type: 1 },
-  { name: 'log_type_idx' }
+  { timestamp: -1, _id: -1 },
+  { name: 'timestamp_id_idx' }
 );
 
-// 4. 全文搜索索引（在日志内容上）
+// 6. 全文搜索索引（在日志内容上）
 db.device_logs.createIndex(
   { 'content.message': 'text', 'content.details': 'text' },
   { name: 'log_content_text_idx' }
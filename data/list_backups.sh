@@ -49,6 +49,22 @@ for backup in "${BACKUP_DIR}"/smart_home_backup_*.tar.gz; do
     fi
 done
 
+# 列出归档备份（code/scripts/backup_db.py生成，mongodump --archive --gzip）
+for backup in "${BACKUP_DIR}"/smart_home_backup_*.archive.gz; do
+    if [ -f "$backup" ]; then
+        BACKUP_COUNT=$((BACKUP_COUNT + 1))
+        BACKUP_NAME=$(basename "$backup")
+        BACKUP_SIZE=$(du -sh "$backup" | cut -f1)
+        BACKUP_TIME=$(stat -f "%Sm" -t "%Y-%m-%d %H:%M:%S" "$backup" 2>/dev/null || stat -c "%y" "$backup" | cut -d'.' -f1)
+        
+        echo ""
+        echo "备份名称: ${BACKUP_NAME}"
+        echo "  类型: 归档备份"
+        echo "  大小: ${BACKUP_SIZE}"
+        echo "  时间: ${BACKUP_TIME}"
+    fi
+done
+
 if [ $BACKUP_COUNT -eq 0 ]; then
     echo ""
     echo "没有找到备份文件"
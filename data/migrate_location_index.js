@@ -0,0 +1,14 @@
+// 一次性迁移脚本：删除旧版本init_db.js创建的单字段地理索引
+// location上存在多个2dsphere索引时$geoNear无法确定使用哪一个，
+// 新的location_status_2dsphere_idx复合索引已覆盖不带状态筛选的查询
+
+// 切换到smart_home数据库
+db = db.getSiblingDB('smart_home');
+
+// 只在旧索引存在时删除，重复执行不会报错
+if (db.devices.getIndexes().some(function (index) { return index.name === 'location_2dsphere_idx'; })) {
+  db.devices.dropIndex('location_2dsphere_idx');
+  print('已删除旧的地理位置索引: location_2dsphere_idx');
+} else {
+  print('旧的地理位置索引不存在，无需迁移');
+}
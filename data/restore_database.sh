@@ -20,6 +20,7 @@ if [ -z "$1" ]; then
     echo "示例:"
     echo "  $0 smart_home_backup_20240101_120000"
     echo "  $0 smart_home_backup_20240101_120000.tar.gz"
+    echo "  $0 smart_home_backup_20240101_120000.archive.gz"
     echo ""
     echo "可用备份列表:"
     echo "=========================================="
@@ -36,6 +37,12 @@ if [ -z "$1" ]; then
                 echo "  $(basename "$backup")"
             fi
         done
+        # 列出归档备份（backup_db.py生成）
+        for backup in "${BACKUP_DIR}"/smart_home_backup_*.archive.gz; do
+            if [ -f "$backup" ]; then
+                echo "  $(basename "$backup")"
+            fi
+        done
     else
         echo "  没有找到备份文件"
     fi
@@ -46,6 +53,13 @@ fi
 BACKUP_NAME="$1"
 BACKUP_PATH="${BACKUP_DIR}/${BACKUP_NAME}"
 RESTORE_PATH=""
+ARCHIVE_PATH=""
+
+# 与backup_db.py一致：只给出备份名称时，也查找同名的归档备份
+if [ ! -e "${BACKUP_PATH}" ] && [ -f "${BACKUP_PATH}.archive.gz" ]; then
+    BACKUP_NAME="${BACKUP_NAME}.archive.gz"
+    BACKUP_PATH="${BACKUP_PATH}.archive.gz"
+fi
 
 # 检查备份文件是否存在
 if [ ! -e "${BACKUP_PATH}" ]; then
@@ -53,8 +67,12 @@ if [ ! -e "${BACKUP_PATH}" ]; then
     exit 1
 fi
 
+# 归档备份由mongorestore直接读取，无需解压
+if [[ "${BACKUP_NAME}" == *.archive.gz ]]; then
+    ARCHIVE_PATH="${BACKUP_PATH}"
+    RESTORE_PATH="${BACKUP_PATH}"
 # 如果是压缩文件，先解压
-if [[ "${BACKUP_NAME}" == *.tar.gz ]]; then
+elif [[ "${BACKUP_NAME}" == *.tar.gz ]]; then
     echo "检测到压缩备份文件，正在解压..."
     TEMP_DIR="${BACKUP_DIR}/temp_restore_$$"
     mkdir -p "${TEMP_DIR}"
@@ -112,15 +130,22 @@ if [[ ! $REPLY =~ ^[Yy][Ee][Ss]$ ]]; then
 fi
 
 # 构建mongorestore命令
-MONGORESTORE_CMD="mongorestore --host ${MONGO_HOST}:${MONGO_PORT} --db ${MONGO_DATABASE} --drop"
+if [ -n "${ARCHIVE_PATH}" ]; then
+    # 归档备份：从归档文件读取，只恢复目标数据库的集合
+    MONGORESTORE_CMD="mongorestore --host ${MONGO_HOST}:${MONGO_PORT} --drop --archive=${ARCHIVE_PATH} --gzip --nsInclude '${MONGO_DATABASE}.*'"
+else
+    MONGORESTORE_CMD="mongorestore --host ${MONGO_HOST}:${MONGO_PORT} --db ${MONGO_DATABASE} --drop"
+fi
 
 # 如果使用认证，添加用户名和密码
 if [ -n "${MONGO_USERNAME}" ] && [ -n "${MONGO_PASSWORD}" ]; then
     MONGORESTORE_CMD="${MONGORESTORE_CMD} --username ${MONGO_USERNAME} --password ${MONGO_PASSWORD} --authenticationDatabase admin"
 fi
 
-# 添加备份路径
-MONGORESTORE_CMD="${MONGORESTORE_CMD} ${RESTORE_PATH}/${MONGO_DATABASE}"
+# 添加备份路径（目录备份）
+if [ -z "${ARCHIVE_PATH}" ]; then
+    MONGORESTORE_CMD="${MONGORESTORE_CMD} ${RESTORE_PATH}/${MONGO_DATABASE}"
+fi
 
 # 执行恢复
 echo "开始恢复..."